@@ -0,0 +1 @@
+"""Benchmark beban & latensi SMARDOS dengan server tiruan lokal untuk Azure QnA dan Ollama."""
@@ -0,0 +1,143 @@
+"""Laporan waktu import smardos2 (python -X importtime) terhadap anggaran.
+
+Modul yang diimpor pages/app.py di level atas diimpor ulang di proses Python baru
+dengan -X importtime, beberapa kali, lalu diambil run tercepat. Exit code 1 jika:
+
+- total waktu import di luar Streamlit melewati --budget-ms, atau
+- dependensi berat yang seharusnya lazy (PDF, langchain, sklearn, numpy, widget suara)
+  ikut terimpor sebelum tampilan pertama.
+
+Contoh:
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --budget-ms 150 --top 20 -o importtime.json
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+
+from benchmarks.load import SMARDOS2_DIR
+
+APP_PAGE = 'pages/app.py'
+# Biaya framework; tidak dihitung ke anggaran karena tidak bisa ditunda.
+FRAMEWORK_MODULES = ('streamlit',)
+LAZY_MODULES = (
+    'PyPDF2',
+    'langchain',
+    'langchain_core',
+    'langchain_ollama',
+    'ollama',
+    'sklearn',
+    'numpy',
+    'streamlit_mic_recorder',
+)
+
+_top_level_import = re.compile(r'^(?:from\s+([\w.]+)\s+import\b|import\s+([\w.]+(?:\s*,\s*[\w.]+)*))')
+_importtime_line = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+
+
+def page_imports(path):
+    """Modul yang diimpor di kolom pertama file halaman (import di dalam fungsi diabaikan)."""
+    modules = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            match = _top_level_import.match(line)
+            if not match:
+                continue
+            names = [match.group(1)] if match.group(1) else match.group(2).split(',')
+            for name in names:
+                name = name.strip()
+                if name and name not in modules:
+                    modules.append(name)
+    return modules
+
+
+def measure(modules, cwd):
+    """Return {modul_level_atas: kumulatif_us} dan set semua modul yang terimpor.
+
+    Modul yang sudah diimpor interpreter sebelum kode dijalankan (site, encodings, ...)
+    tidak ikut dihitung.
+    """
+    source = 'import ' + ', '.join(modules) if modules else 'pass'
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', source],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise SystemExit(f'Import gagal:\n{completed.stderr[-2000:]}')
+    top_level = {}
+    imported = set()
+    for line in completed.stderr.splitlines():
+        match = _importtime_line.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        imported.add(name)
+        # Modul level atas ditulis dengan satu spasi setelah '|', turunannya menjorok.
+        if len(indent) == 1:
+            top_level[name] = top_level.get(name, 0) + int(cumulative)
+    return top_level, imported
+
+
+def is_framework(name):
+    return any(name == root or name.startswith(root + '.') for root in FRAMEWORK_MODULES)
+
+
+def build_report(args):
+    modules = page_imports(f'{SMARDOS2_DIR}/{APP_PAGE}')
+    _, interpreter = measure([], SMARDOS2_DIR)
+    best = None
+    for _ in range(max(1, args.repeat)):
+        top_level, imported = measure(modules, SMARDOS2_DIR)
+        top_level = {name: us for name, us in top_level.items() if name not in interpreter}
+        app_us = sum(us for name, us in top_level.items() if not is_framework(name))
+        if best is None or app_us < best[0]:
+            best = (app_us, top_level, imported)
+    app_us, top_level, imported = best
+
+    eager = sorted(name for name in LAZY_MODULES if name in imported)
+    ranked = sorted(top_level.items(), key=lambda item: item[1], reverse=True)
+    return {
+        'page': APP_PAGE,
+        'imports': modules,
+        'framework_ms': round(sum(us for name, us in top_level.items() if is_framework(name)) / 1000, 1),
+        'app_ms': round(app_us / 1000, 1),
+        'budget_ms': args.budget_ms,
+        'eager_heavy_modules': eager,
+        'top': [{'module': name, 'cumulative_ms': round(us / 1000, 1)} for name, us in ranked[:args.top]],
+        'ok': app_us / 1000 <= args.budget_ms and not eager,
+    }
+
+
+def print_report(report):
+    print(f"Import {report['page']}: {report['app_ms']} ms di luar Streamlit "
+          f"(anggaran {report['budget_ms']} ms), Streamlit {report['framework_ms']} ms")
+    for row in report['top']:
+        print(f"  {row['cumulative_ms']:>8.1f} ms  {row['module']}")
+    if report['eager_heavy_modules']:
+        print('Modul berat terimpor saat start (seharusnya lazy): ' + ', '.join(report['eager_heavy_modules']))
+    print('OK' if report['ok'] else 'GAGAL')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=200.0,
+                        help='batas total waktu import di luar Streamlit (ms)')
+    parser.add_argument('--repeat', type=int, default=3, help='jumlah run; yang tercepat dipakai')
+    parser.add_argument('--top', type=int, default=15, help='jumlah modul level atas yang ditampilkan')
+    parser.add_argument('-o', '--output', help='tulis laporan JSON ke berkas ini')
+    args = parser.parse_args(argv)
+
+    report = build_report(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
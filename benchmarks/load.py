@@ -0,0 +1,441 @@
+"""Load driver SMARDOS: kirim beban terkontrol lalu laporkan hasilnya sebagai JSON.
+
+Contoh:
+    python -m benchmarks smardos1 --backend azure --concurrency 16 --requests 2000 -o sebelum.json
+    python -m benchmarks smardos2 --concurrency 4 --requests 40 -o sebelum.json
+    python -m benchmarks compare sebelum.json sesudah.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.mock_ollama import MockOllamaServer
+from benchmarks.mock_qna import MockQnAServer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SMARDOS1_DIR = os.path.join(ROOT_DIR, 'smardos1')
+SMARDOS2_DIR = os.path.join(ROOT_DIR, 'smardos2')
+
+QUESTIONS = [
+    "Apa itu fotosintesis?",
+    "Bagaimana proses terjadinya hujan?",
+    "Apa fungsi akar pada tumbuhan?",
+    "Kenapa bulan bisa berubah bentuk?",
+    "Apa yang dimaksud dengan gaya gravitasi?",
+    "Bagaimana cara kerja jantung manusia?",
+    "Apa perbedaan benda padat dan cair?",
+    "Apa itu ekosistem?",
+    "Mengapa besi bisa berkarat?",
+    "Apa sumber energi utama di bumi?",
+]
+
+ACADEMIC_QUESTIONS = [
+    "Jelaskan perbedaan penelitian kualitatif dan kuantitatif.",
+    "Apa itu validitas dan reliabilitas instrumen penelitian?",
+    "Bagaimana cara menentukan ukuran sampel penelitian?",
+    "Jelaskan konsep regresi linear sederhana.",
+    "Apa yang dimaksud dengan kerangka teori dalam skripsi?",
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentiles(values):
+    """p50/p95/p99 nearest-rank dalam milidetik."""
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+    return {
+        'p50': round(rank(50) * 1000, 2),
+        'p95': round(rank(95) * 1000, 2),
+        'p99': round(rank(99) * 1000, 2),
+        'mean': round(sum(ordered) / len(ordered) * 1000, 2),
+        'max': round(ordered[-1] * 1000, 2),
+    }
+
+
+def question_stream(base, total, distinct):
+    """distinct=0 memakai daftar apa adanya (banyak pengulangan, cocok untuk uji cache)."""
+    for i in range(total):
+        question = base[i % len(base)]
+        if distinct:
+            question = f"{question} ({i % distinct})"
+        yield question
+
+
+def rss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def child_pids(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+class MemorySampler:
+    """Catat RSS terakhir dan puncak per proses (master + worker) selama benchmark."""
+
+    def __init__(self, root_pid, interval=0.2):
+        self.root_pid = root_pid
+        self.interval = interval
+        self.peak = {}
+        self.last = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='bench-memory', daemon=True)
+
+    def sample(self):
+        for pid in [self.root_pid] + child_pids(self.root_pid):
+            rss = rss_kb(pid)
+            if rss is not None:
+                self.last[pid] = rss
+                self.peak[pid] = max(rss, self.peak.get(pid, 0))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def report(self):
+        processes = [
+            {
+                'pid': pid,
+                'role': 'main' if pid == self.root_pid else 'worker',
+                'rss_mb': round(self.last[pid] / 1024, 1),
+                'peak_rss_mb': round(self.peak[pid] / 1024, 1),
+            }
+            for pid in sorted(self.last)
+        ]
+        return {
+            'processes': processes,
+            'total_rss_mb': round(sum(p['rss_mb'] for p in processes), 1),
+        }
+
+
+def run_load(call, items, concurrency):
+    """Jalankan call(item) -> (ok, ttft) secara paralel; latensi diukur di sini."""
+    latencies, ttfts, errors = [], [], []
+    lock = threading.Lock()
+
+    def task(item):
+        started = time.perf_counter()
+        try:
+            ok, ttft = call(item)
+            detail = None if ok else 'gagal'
+        except Exception as e:
+            ok, ttft, detail = False, None, f'{type(e).__name__}: {e}'
+        elapsed = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+                if ttft is not None:
+                    ttfts.append(ttft)
+            else:
+                errors.append(detail)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(task, items))
+    duration = time.perf_counter() - started
+
+    completed = len(latencies)
+    return {
+        'requests': completed + len(errors),
+        'completed': completed,
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:5],
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(completed / duration, 2) if duration else 0.0,
+        'latency_ms': percentiles(latencies),
+        'ttft_ms': percentiles(ttfts),
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def wait_until_ready(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server berhenti saat start (exit {process.returncode})")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server tidak siap dalam {timeout} detik: {url}")
+
+
+def start_smardos1(args, qna_url):
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        'QNA_BACKEND': args.backend,
+        'AZURE_QNA_ENDPOINT': qna_url,
+        'AZURE_QNA_KEY': 'benchmark',
+        'ANSWER_CACHE_SIZE': str(args.cache_size),
+        'PYTHONUNBUFFERED': '1',
+        'GUNICORN_ACCESS_LOG': '',
+    })
+    if args.server == 'gunicorn':
+        command = [
+            sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-k', args.worker_class,
+            '-w', str(args.workers), '--threads', str(args.threads),
+            '-b', f'127.0.0.1:{port}', '--log-level', 'warning', 'run:app',
+        ]
+    else:
+        command = [sys.executable, '-m', 'flask', '--app', 'run.py', 'run', '--port', str(port), '--with-threads']
+    process = subprocess.Popen(command, cwd=SMARDOS1_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+    return process, f'http://127.0.0.1:{port}'
+
+
+def bench_smardos1(args):
+    mock = None
+    qna_url = args.qna_url
+    if args.backend == 'azure' and not qna_url:
+        mock = MockQnAServer(latency_ms=args.qna_latency_ms, jitter_ms=args.qna_jitter_ms,
+                             error_rate=args.qna_error_rate).start()
+        qna_url = mock.url
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        process, base_url = start_smardos1(args, qna_url or '')
+    try:
+        if process is not None:
+            wait_until_ready(base_url + '/', process)
+
+        local = threading.local()
+
+        def ask(question):
+            session = getattr(local, 'session', None)
+            if session is None:
+                session = local.session = requests.Session()
+            response = session.post(base_url + '/ask', json={'question': question}, timeout=args.timeout)
+            return response.status_code == 200, None
+
+        # Pemanasan: koneksi, import malas, dan snapshot indeks tidak ikut terukur.
+        for question in QUESTIONS[:args.warmup]:
+            ask(question)
+
+        questions = list(question_stream(QUESTIONS, args.requests, args.distinct))
+        if process is not None:
+            with MemorySampler(process.pid) as sampler:
+                result = run_load(ask, questions, args.concurrency)
+            result['memory'] = sampler.report()
+        else:
+            result = run_load(ask, questions, args.concurrency)
+            result['memory'] = None
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if mock is not None:
+            mock.shutdown()
+
+    result['target'] = 'smardos1'
+    result['config'] = {
+        'backend': args.backend,
+        'server': None if args.url else args.server,
+        'worker_class': None if args.url or args.server != 'gunicorn' else args.worker_class,
+        'workers': None if args.url else args.workers,
+        'threads': None if args.url else args.threads,
+        'concurrency': args.concurrency,
+        'distinct': args.distinct,
+        'cache_size': args.cache_size,
+        'qna_latency_ms': args.qna_latency_ms if mock else None,
+        'qna_error_rate': args.qna_error_rate if mock else None,
+        'mock_requests': mock.requests if mock else None,
+    }
+    return result
+
+
+def bench_smardos2(args):
+    # services.* diimpor seperti dari halaman Streamlit; cache_resource bekerja tanpa runtime.
+    os.environ.setdefault('OLLAMA_MAX_CONCURRENCY', str(args.ollama_concurrency))
+    if SMARDOS2_DIR not in sys.path:
+        sys.path.insert(0, SMARDOS2_DIR)
+    from services.generation import stream_smardos_response
+
+    # Peringatan "missing ScriptRunContext" wajar di luar `streamlit run`.
+    logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').setLevel(logging.ERROR)
+
+    mock = None
+    base_url = args.ollama_url
+    if base_url is None:
+        mock = MockOllamaServer(models=[args.model], tokens=args.tokens,
+                                tokens_per_sec=args.tokens_per_sec, load_seconds=args.load_seconds).start()
+        base_url = mock.url
+
+    def generate(question):
+        started = time.perf_counter()
+        ttft = None
+        for chunk in stream_smardos_response(question, args.model, base_url):
+            if ttft is None and chunk:
+                ttft = time.perf_counter() - started
+        return ttft is not None, ttft
+
+    try:
+        for question in ACADEMIC_QUESTIONS[:args.warmup]:
+            generate(question)
+        # distinct default 0 berarti semua prompt unik agar scheduler tidak menggabungkannya.
+        questions = list(question_stream(ACADEMIC_QUESTIONS, args.requests, args.distinct or args.requests))
+        with MemorySampler(os.getpid()) as sampler:
+            result = run_load(generate, questions, args.concurrency)
+        result['memory'] = sampler.report()
+    finally:
+        if mock is not None:
+            mock.shutdown()
+
+    result['target'] = 'smardos2'
+    result['config'] = {
+        'model': args.model,
+        'concurrency': args.concurrency,
+        'ollama_concurrency': int(os.environ['OLLAMA_MAX_CONCURRENCY']),
+        'tokens': args.tokens if mock else None,
+        'tokens_per_sec': args.tokens_per_sec if mock else None,
+        'mock_requests': mock.requests if mock else None,
+    }
+    return result
+
+
+COMPARED_METRICS = [
+    ('throughput_rps', None),
+    ('errors', None),
+    ('latency_ms', 'p50'), ('latency_ms', 'p95'), ('latency_ms', 'p99'),
+    ('ttft_ms', 'p50'), ('ttft_ms', 'p95'), ('ttft_ms', 'p99'),
+    ('memory', 'total_rss_mb'),
+]
+
+
+def compare(before, after):
+    rows = []
+    for key, sub in COMPARED_METRICS:
+        old, new = before.get(key), after.get(key)
+        if sub is not None:
+            old = old.get(sub) if old else None
+            new = new.get(sub) if new else None
+        if old is None and new is None:
+            continue
+        change = None
+        if old and new is not None:
+            change = round((new - old) / old * 100, 1)
+        rows.append({'metric': key if sub is None else f'{key}.{sub}', 'before': old, 'after': new, 'change_pct': change})
+    return rows
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def common(sub, requests_default, concurrency_default):
+        sub.add_argument('--requests', type=int, default=requests_default)
+        sub.add_argument('--concurrency', type=int, default=concurrency_default)
+        sub.add_argument('--warmup', type=int, default=3)
+        sub.add_argument('--distinct', type=int, default=0,
+                         help='jumlah variasi pertanyaan unik (0 = daftar bawaan berulang)')
+        sub.add_argument('-o', '--output', help='simpan hasil JSON ke berkas ini')
+
+    s1 = commands.add_parser('smardos1', help='beban ke endpoint /ask Flask')
+    common(s1, 500, 8)
+    s1.add_argument('--backend', choices=('local', 'azure'), default='local')
+    s1.add_argument('--url', help='pakai server yang sudah berjalan alih-alih menjalankan sendiri')
+    s1.add_argument('--server', choices=('gunicorn', 'flask'), default='gunicorn')
+    s1.add_argument('--worker-class', choices=('gevent', 'sync', 'gthread'), default='gevent')
+    s1.add_argument('--workers', type=int, default=2)
+    s1.add_argument('--threads', type=int, default=4)
+    s1.add_argument('--cache-size', type=int, default=1024)
+    s1.add_argument('--timeout', type=float, default=30)
+    s1.add_argument('--qna-url', help='endpoint Azure QnA sungguhan/tiruan yang sudah berjalan')
+    s1.add_argument('--qna-latency-ms', type=float, default=50.0)
+    s1.add_argument('--qna-jitter-ms', type=float, default=5.0)
+    s1.add_argument('--qna-error-rate', type=float, default=0.0)
+    s1.add_argument('--verbose', action='store_true', help='tampilkan log server')
+
+    s2 = commands.add_parser('smardos2', help='beban ke jalur generate_smardos_response')
+    common(s2, 20, 4)
+    s2.add_argument('--model', default='mock-llm:latest')
+    s2.add_argument('--ollama-url', help='Ollama sungguhan yang sudah berjalan')
+    s2.add_argument('--ollama-concurrency', type=int, default=1)
+    s2.add_argument('--tokens', type=int, default=60)
+    s2.add_argument('--tokens-per-sec', type=float, default=60.0)
+    s2.add_argument('--load-seconds', type=float, default=0.0)
+
+    cmp = commands.add_parser('compare', help='bandingkan dua hasil JSON')
+    cmp.add_argument('before')
+    cmp.add_argument('after')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'compare':
+        with open(args.before) as f:
+            before = json.load(f)
+        with open(args.after) as f:
+            after = json.load(f)
+        print(json.dumps(compare(before, after), indent=2))
+        return
+
+    result = bench_smardos1(args) if args.command == 'smardos1' else bench_smardos2(args)
+    result['environment'] = environment()
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    print(output)
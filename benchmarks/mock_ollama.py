@@ -0,0 +1,173 @@
+"""Server tiruan Ollama: /api/tags, /api/ps, /api/generate, /api/chat (stream NDJSON)
+dan /api/embed, dengan laju token dan waktu muat model yang bisa diatur."""
+import argparse
+import hashlib
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILLER = (
+    "Metode penelitian kualitatif menekankan pemahaman mendalam terhadap fenomena "
+    "melalui wawancara observasi dan analisis dokumen sehingga peneliti dapat "
+    "menafsirkan makna dari sudut pandang partisipan."
+).split()
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, obj, status=200):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, obj):
+        line = (json.dumps(obj) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def do_GET(self):
+        server = self.server
+        if self.path == "/api/tags":
+            return self._send_json({"models": [{"name": name} for name in server.models]})
+        if self.path == "/api/ps":
+            with server.lock:
+                loaded = sorted(server.loaded)
+            return self._send_json({"models": [{"name": name} for name in loaded]})
+        self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with server.lock:
+            server.requests[self.path] = server.requests.get(self.path, 0) + 1
+
+        if self.path in ("/api/embed", "/api/embeddings"):
+            return self._embed(body)
+        if self.path not in ("/api/generate", "/api/chat"):
+            return self._send_json({"error": "not found"}, status=404)
+
+        model = body.get("model", "")
+        if model not in server.models:
+            return self._send_json({"error": f"model '{model}' not found"}, status=404)
+        self._load(model)
+
+        chat = self.path == "/api/chat"
+        prompt = body.get("prompt") if not chat else json.dumps(body.get("messages", []))
+        if not chat and not prompt:
+            # Prompt kosong = permintaan warm-up Ollama.
+            return self._send_json({"model": model, "response": "", "done": True})
+
+        prompt_tokens = max(1, len(prompt) // 4)
+        time.sleep(prompt_tokens / server.prefill_tokens_per_sec)
+        tokens = [FILLER[i % len(FILLER)] + " " for i in range(server.tokens)]
+
+        def piece(text, done):
+            data = {"model": model, "done": done}
+            if chat:
+                data["message"] = {"role": "assistant", "content": text}
+            else:
+                data["response"] = text
+            if done:
+                data.update({"done_reason": "stop", "prompt_eval_count": prompt_tokens, "eval_count": len(tokens)})
+            return data
+
+        if not body.get("stream", True):
+            time.sleep(len(tokens) / server.tokens_per_sec)
+            return self._send_json(piece("".join(tokens), True))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for token in tokens:
+                time.sleep(1 / server.tokens_per_sec)
+                self._write_chunk(piece(token, False))
+            self._write_chunk(piece("", True))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Klien memutus stream: hentikan "generasi" seperti Ollama asli.
+            with server.lock:
+                server.cancelled += 1
+
+    def _load(self, model):
+        server = self.server
+        with server.lock:
+            cold = model not in server.loaded
+            server.loaded.add(model)
+        if cold:
+            time.sleep(server.load_seconds)
+
+    def _embed(self, body):
+        inputs = body.get("input", body.get("prompt", ""))
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        embeddings = []
+        for text in inputs:
+            digest = hashlib.sha256(text.encode("utf-8")).digest()
+            embeddings.append([(b - 128) / 128 for b in digest[:16]])
+        self._send_json({"model": body.get("model"), "embeddings": embeddings})
+
+
+class MockOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Klien yang memutus koneksi (timeout di sisi SMARDOS) adalah skenario yang diuji, bukan error.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def __init__(self, host="127.0.0.1", port=0, models=("mock-llm:latest",), tokens=60,
+                 tokens_per_sec=30.0, prefill_tokens_per_sec=2000.0, load_seconds=0.0):
+        super().__init__((host, port), _OllamaHandler)
+        self.models = list(models)
+        self.tokens = tokens
+        self.tokens_per_sec = tokens_per_sec
+        self.prefill_tokens_per_sec = prefill_tokens_per_sec
+        self.load_seconds = load_seconds
+        self.loaded = set()
+        self.requests = {}
+        self.cancelled = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="mock-ollama", daemon=True).start()
+        return self
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--model", action="append", dest="models")
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--tokens-per-sec", type=float, default=30.0)
+    parser.add_argument("--prefill-tokens-per-sec", type=float, default=2000.0)
+    parser.add_argument("--load-seconds", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    server = MockOllamaServer(
+        args.host, args.port, args.models or ["mock-llm:latest"], args.tokens,
+        args.tokens_per_sec, args.prefill_tokens_per_sec, args.load_seconds,
+    )
+    print(f"Mock Ollama di {server.url}", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Server tiruan Azure QnA: bentuk respons `answers[].confidenceScore` yang sama,
+dengan latensi dan tingkat error yang bisa diatur."""
+import argparse
+import json
+import sys
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _QnAHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Tanpa ini header dan body terkirim di dua segmen TCP dan delayed-ACK
+    # menambah ~40 ms ke setiap request keep-alive.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send(400, b'{"error": "invalid json"}')
+
+        with server.lock:
+            server.requests += 1
+        delay = max(0.0, random.gauss(server.latency, server.jitter))
+        time.sleep(delay)
+
+        if random.random() < server.error_rate:
+            return self._send(503, b'{"error": "mock upstream error"}')
+
+        question = str(payload.get("question", ""))
+        body = {
+            "answers": [{
+                "answer": f"Jawaban tiruan untuk: {question}",
+                "confidenceScore": server.confidence,
+                "id": abs(hash(question)) % 10000,
+                "source": "mock_qna",
+            }]
+        }
+        self._send(200, json.dumps(body).encode("utf-8"))
+
+
+class MockQnAServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Klien yang memutus koneksi (timeout di sisi SMARDOS) adalah skenario yang diuji, bukan error.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=50.0, jitter_ms=5.0, error_rate=0.0, confidence=0.9):
+        super().__init__((host, port), _QnAHandler)
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.confidence = confidence
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="mock-qna", daemon=True).start()
+        return self
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--confidence", type=float, default=0.9)
+    args = parser.parse_args(argv)
+    server = MockQnAServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.confidence)
+    print(f"Mock Azure QnA di {server.url}", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,18 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    from app.services import create_qna_service
+    app.extensions['qna_service'] = create_qna_service(app)
+
+    from app.metrics import init_metrics
+    init_metrics(app, app.extensions['qna_service'])
+
+    from app.limits import init_limits
+    init_limits(app)
+
+    from app.commands import build_index_command
+    app.cli.add_command(build_index_command)
+
     from app.main import bp as main_bp
     app.register_blueprint(main_bp)
 
@@ -0,0 +1,14 @@
+import click
+from flask import current_app
+
+from app.services.index_snapshot import build_snapshot, prune_snapshots
+
+
+@click.command('build-index')
+@click.option('--force', is_flag=True, help='Bangun ulang walaupun snapshot versi yang sama sudah ada.')
+def build_index_command(force):
+    """Kompilasi datasets/*.xlsx menjadi snapshot indeks QnA."""
+    snapshot_dir = current_app.config['QNA_INDEX_DIR']
+    version = build_snapshot(current_app.config['QNA_DATASETS_DIR'], snapshot_dir, force=force)
+    prune_snapshots(snapshot_dir)
+    click.echo(f"Snapshot QnA aktif: {version} ({snapshot_dir})")
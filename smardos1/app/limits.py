@@ -0,0 +1,83 @@
+import threading
+
+from flask import g, jsonify, request
+
+from app.metrics import CallbackMetric, Counter, REGISTRY
+
+BUSY_MESSAGE = 'Server sedang sibuk melayani banyak pertanyaan. Coba lagi sebentar lagi ya!'
+
+REJECTED_REQUESTS = REGISTRY.register(Counter(
+    'smardos_rejected_requests_total', 'Request yang ditolak 503 karena batas konkurensi worker penuh.',
+    ('endpoint',)))
+
+
+class ConcurrencyLimiter:
+    """Batas request yang sedang diproses per worker.
+
+    Di worker gevent, threading sudah di-monkeypatch sehingga semaphore ini
+    bekerja per greenlet; di worker sync/thread ia membatasi thread.
+    """
+
+    def __init__(self, limit, acquire_timeout=0.0):
+        self.limit = limit
+        self.acquire_timeout = acquire_timeout
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def try_acquire(self):
+        if self.acquire_timeout > 0:
+            acquired = self._semaphore.acquire(timeout=self.acquire_timeout)
+        else:
+            acquired = self._semaphore.acquire(blocking=False)
+        if acquired:
+            with self._lock:
+                self.in_flight += 1
+        return acquired
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._semaphore.release()
+
+
+def init_limits(app):
+    """Tolak cepat dengan 503 + Retry-After saat worker penuh, daripada antre tanpa batas."""
+    limit = app.config['MAX_INFLIGHT_REQUESTS']
+    if limit <= 0:
+        return
+    limiter = ConcurrencyLimiter(limit, app.config['INFLIGHT_ACQUIRE_TIMEOUT'])
+    limited = set(app.config['LIMITED_ENDPOINTS'])
+    retry_after = str(app.config['BUSY_RETRY_AFTER'])
+    app.extensions['limiter'] = limiter
+
+    REGISTRY.register(CallbackMetric(
+        'smardos_inflight_requests', 'Request yang sedang diproses worker ini.', lambda: limiter.in_flight))
+    REGISTRY.register(CallbackMetric(
+        'smardos_inflight_limit', 'Batas request bersamaan per worker (MAX_INFLIGHT_REQUESTS).', lambda: limiter.limit))
+
+    @app.before_request
+    def acquire_slot():
+        if request.endpoint not in limited:
+            return None
+        if not limiter.try_acquire():
+            REJECTED_REQUESTS.inc(request.endpoint)
+            response = jsonify({'error': BUSY_MESSAGE})
+            response.status_code = 503
+            response.headers['Retry-After'] = retry_after
+            return response
+        g.limiter_slot = True
+        return None
+
+    @app.after_request
+    def hold_slot_while_streaming(response):
+        # Body stream (/ask/stream) baru dikirim setelah view selesai; slot dilepas saat
+        # server menutup body, yaitu stream selesai atau klien memutus koneksi.
+        if response.is_streamed and g.pop('limiter_slot', False):
+            response.call_on_close(limiter.release)
+        return response
+
+    @app.teardown_request
+    def release_slot(exc):
+        if g.pop('limiter_slot', False):
+            limiter.release()
@@ -1,26 +1,88 @@
-from flask import render_template, request, jsonify
+from flask import Response, current_app, render_template, request, jsonify, stream_with_context
 from app.main import bp
-from app.services.qna_service import QnAService
+from app.metrics import current_request_id, span
+from app.services import get_qna_service
+from app.streaming import Cancellation, relay
 
 @bp.route('/ask', methods=['POST'])
 def ask():
     try:
-        data = request.get_json()
-        if not data or 'question' not in data:
+        with span('parse'):
+            data = request.get_json(silent=True)
+        if not isinstance(data, dict) or 'question' not in data:
             return jsonify({'error': 'Maaf, kami tidak menemukan pertanyaan Anda. Mohon sertakan field "question" pada permintaan Anda.'}), 400
 
         question = data['question']
-        if not question:
+        if not isinstance(question, str) or not question:
             return jsonify({'error': 'Tidak ada pertanyaan yang diberikan.'}), 400
 
-        qna_service = QnAService()
+        qna_service = get_qna_service()
         
-        answer_text, confidence = qna_service.get_answer(question) 
+        with span('answer'):
+            answer_text, confidence = qna_service.get_answer(question) 
         
-        return jsonify({'answer': answer_text})
+        with span('serialize'):
+            return jsonify({'answer': answer_text})
 
-    except Exception as e:
-        return jsonify({'error': 'Terjadi kesalahan internal pada server.'}), 500
+    except Exception:
+        current_app.logger.exception(f"Error on /ask (request {current_request_id()})")
+        return jsonify({'error': 'Terjadi kesalahan internal pada server.', 'request_id': current_request_id()}), 500
+
+@bp.route('/ask/stream', methods=['POST'])
+def ask_stream():
+    with span('parse'):
+        data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'question' not in data:
+        return jsonify({'error': 'Maaf, kami tidak menemukan pertanyaan Anda. Mohon sertakan field "question" pada permintaan Anda.'}), 400
+
+    question = data['question']
+    if not isinstance(question, str) or not question:
+        return jsonify({'error': 'Tidak ada pertanyaan yang diberikan.'}), 400
+
+    cancel = Cancellation()
+    events = get_qna_service().stream_answer(question, cancel=cancel)
+    # stream_with_context menahan request (dan slot limiter) sampai stream selesai atau klien pergi.
+    body = stream_with_context(relay(events, current_app.config['STREAM_HEARTBEAT_SECONDS'], cancel))
+    return Response(body, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Matikan buffering nginx agar token sampai ke browser begitu dikirim.
+        'X-Accel-Buffering': 'no',
+    })
+
+@bp.route('/ask/batch', methods=['POST'])
+def ask_batch():
+    try:
+        with span('parse'):
+            data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get('questions'), list):
+            return jsonify({'error': 'Mohon sertakan field "questions" berupa daftar pertanyaan.'}), 400
+
+        questions = data['questions']
+        batch_max = current_app.config['ASK_BATCH_MAX']
+        if len(questions) > batch_max:
+            return jsonify({'error': f'Maksimal {batch_max} pertanyaan per permintaan.'}), 400
+
+        valid = [i for i, q in enumerate(questions) if isinstance(q, str) and q.strip()]
+        with span('answer'):
+            answers = get_qna_service().get_answers([questions[i] for i in valid]) if valid else []
+
+        results = [{'question': q, 'error': 'Tidak ada pertanyaan yang diberikan.'} for q in questions]
+        for i, answer in zip(valid, answers):
+            results[i] = answer
+
+        with span('serialize'):
+            return jsonify({'results': results, 'count': len(results)})
+
+    except Exception:
+        current_app.logger.exception(f"Error on /ask/batch (request {current_request_id()})")
+        return jsonify({'error': 'Terjadi kesalahan internal pada server.', 'request_id': current_request_id()}), 500
+
+@bp.route('/ask/cache', methods=['GET'])
+def ask_cache_stats():
+    cache = getattr(get_qna_service(), 'cache', None)
+    if cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **cache.stats()})
 
 @bp.route('/')
 def index():
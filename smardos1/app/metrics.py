@@ -0,0 +1,298 @@
+import bisect
+import logging
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import Response, g, request
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONFIDENCE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+_valid_request_id = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# Diisi per request oleh hook Flask; di luar request (CLI, thread batch) bernilai None.
+_request_id = ContextVar('smardos_request_id', default=None)
+_request_spans = ContextVar('smardos_request_spans', default=None)
+_request_tier = ContextVar('smardos_request_tier', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, labels, extra=()):
+    pairs = list(zip(labelnames, labels)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        if not REGISTRY.enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+
+
+class Histogram:
+    """Histogram kumulatif ala Prometheus; observe() hanya bisect + satu increment."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        if not REGISTRY.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = sorted(
+                (labels, (list(counts), total, count)) for labels, (counts, total, count) in self._values.items()
+            )
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                label_text = _format_labels(self.labelnames, labels, [('le', _format_value(float(bound)))])
+                yield f'{self.name}_bucket{label_text} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}'
+
+
+class CallbackMetric:
+    """Nilai yang dibaca saat scrape dari objek lain (statistik cache, status breaker)."""
+
+    def __init__(self, name, documentation, callback, type='gauge', labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.type = type
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.enabled = True
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        # Berdasarkan nama, jadi create_app berulang (mis. di test) tidak menggandakan metrik.
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                logger.exception("Gagal membaca metrik %s", metric.name)
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    'smardos_http_requests_total', 'Jumlah request HTTP per endpoint dan status.', ('endpoint', 'method', 'status')))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    'smardos_http_request_duration_seconds', 'Durasi request HTTP di dalam Flask.', ('endpoint',)))
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    'smardos_stage_duration_seconds', 'Durasi per tahap pemrosesan pertanyaan.', ('stage',)))
+QNA_CONFIDENCE = REGISTRY.register(Histogram(
+    'smardos_qna_confidence', 'Sebaran skor confidence jawaban backend QnA.', ('backend',), CONFIDENCE_BUCKETS))
+QNA_FALLBACKS = REGISTRY.register(Counter(
+    'smardos_qna_fallbacks_total', 'Jawaban pengganti karena confidence di bawah ambang atau tanpa jawaban.',
+    ('backend', 'reason')))
+ANSWER_TIERS = REGISTRY.register(Counter(
+    'smardos_answer_tier_total', 'Tier router yang akhirnya menjawab (cache, chitchat, retrieval, llm, fallback).',
+    ('tier',)))
+QNA_UPSTREAM_ERRORS = REGISTRY.register(Counter(
+    'smardos_qna_upstream_errors_total', 'Kegagalan memanggil Azure QnA atau LLM per jenis (timeout, connection, llm_timeout, ...).',
+    ('kind',)))
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+@contextmanager
+def span(stage):
+    """Ukur satu tahap: masuk histogram tahap dan header Server-Timing request aktif."""
+    if not REGISTRY.enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_LATENCY.observe(elapsed, stage)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+def note_answer_tier(tier):
+    """Catat tier penjawab; dikirim ke klien lewat header X-Answer-Tier."""
+    ANSWER_TIERS.inc(tier)
+    holder = _request_tier.get()
+    if holder is not None:
+        holder[0] = tier
+
+
+def record_answer(backend, confidence, threshold, answered=True):
+    """Catat skor confidence dan fallback untuk satu jawaban backend."""
+    QNA_CONFIDENCE.observe(confidence, backend)
+    if not answered:
+        QNA_FALLBACKS.inc(backend, 'no_answer')
+    elif confidence < threshold:
+        QNA_FALLBACKS.inc(backend, 'low_confidence')
+
+
+def _endpoint_label():
+    rule = request.url_rule
+    # Pakai pola rute, bukan path mentah, agar label tidak meledak karena URL acak.
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def _before_request():
+    incoming = request.headers.get(REQUEST_ID_HEADER, '')
+    request_id = incoming if _valid_request_id.match(incoming) else uuid.uuid4().hex
+    g.request_id = request_id
+    g.request_started = time.perf_counter()
+    g.request_spans = []
+    g.request_tier = [None]
+    g.metrics_tokens = (
+        _request_id.set(request_id), _request_spans.set(g.request_spans), _request_tier.set(g.request_tier),
+    )
+
+
+def _after_request(response):
+    request_id = g.get('request_id')
+    if request_id is None:
+        return response
+    response.headers[REQUEST_ID_HEADER] = request_id
+    if g.request_tier[0] is not None:
+        response.headers['X-Answer-Tier'] = g.request_tier[0]
+    if REGISTRY.enabled:
+        elapsed = time.perf_counter() - g.request_started
+        endpoint = _endpoint_label()
+        if response.is_streamed:
+            # Body stream (mis. /ask/stream) baru dikirim setelah view kembali; ukur sampai ditutup.
+            started = g.request_started
+            response.call_on_close(lambda: HTTP_LATENCY.observe(time.perf_counter() - started, endpoint))
+        else:
+            HTTP_LATENCY.observe(elapsed, endpoint)
+        HTTP_REQUESTS.inc(endpoint, request.method, str(response.status_code))
+        spans = g.request_spans
+        if spans:
+            response.headers['Server-Timing'] = ', '.join(f'{stage};dur={seconds * 1000:.2f}' for stage, seconds in spans)
+            logger.debug("request %s %s %.1fms %s", request_id, endpoint, elapsed * 1000,
+                         ' '.join(f'{stage}={seconds * 1000:.1f}ms' for stage, seconds in spans))
+    return response
+
+
+def _teardown_request(exc):
+    tokens = g.pop('metrics_tokens', None)
+    if tokens is not None:
+        _request_id.reset(tokens[0])
+        _request_spans.reset(tokens[1])
+        _request_tier.reset(tokens[2])
+
+
+def metrics_view():
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _register_service_metrics(service):
+    cache = getattr(service, 'cache', None)
+    if cache is not None:
+        REGISTRY.register(CallbackMetric(
+            'smardos_answer_cache_events_total', 'Kejadian cache jawaban (hit, miss, coalesced, ...).',
+            lambda: {(event,): cache.stats()[event]
+                     for event in ('hits', 'misses', 'coalesced', 'evictions', 'expirations', 'uncacheable')},
+            type='counter', labelnames=('event',),
+        ))
+        REGISTRY.register(CallbackMetric(
+            'smardos_answer_cache_entries', 'Jumlah entri di cache jawaban.', lambda: len(cache)))
+    breaker = getattr(service, 'breaker', None)
+    if breaker is not None:
+        REGISTRY.register(CallbackMetric(
+            'smardos_qna_circuit_open', '1 jika circuit breaker Azure QnA sedang terbuka.',
+            lambda: int(breaker.state == 'open')))
+
+
+def init_metrics(app, service=None):
+    """Pasang request ID, span per tahap, dan rute /metrics (teks Prometheus).
+
+    Dengan METRICS_ENABLED=0 rute /metrics tidak didaftarkan dan span menjadi no-op;
+    request ID tetap diteruskan karena dipakai di log.
+    """
+    REGISTRY.enabled = app.config['METRICS_ENABLED']
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    if not REGISTRY.enabled:
+        return
+    if service is not None:
+        _register_service_metrics(service)
+    app.add_url_rule(app.config['METRICS_PATH'], 'metrics', metrics_view)
@@ -0,0 +1,68 @@
+from flask import current_app
+
+QNA_BACKENDS = ('local', 'azure')
+
+
+def create_qna_service(app):
+    """Satu objek service per proses worker, dibuat sekali di create_app."""
+    service = _create_router(app, _create_backend(app))
+    if app.config['ANSWER_CACHE_SIZE'] > 0:
+        from app.services.answer_cache import AnswerCache, CachedQnAService
+        cache = AnswerCache(app.config['ANSWER_CACHE_SIZE'], app.config['ANSWER_CACHE_TTL'])
+        index_manager = app.extensions.get('qna_index')
+        version = (lambda: index_manager.current.version) if index_manager is not None else (lambda: None)
+        service = CachedQnAService(service, cache, version=version)
+    return service
+
+
+def _create_backend(app):
+    backend = app.config['QNA_BACKEND']
+    if backend == 'local':
+        from app.services.index_snapshot import IndexManager
+        from app.services.local_qna_service import LocalQnAService
+        index_manager = IndexManager(
+            app.config['QNA_DATASETS_DIR'],
+            app.config['QNA_INDEX_DIR'],
+            reload_interval=app.config['QNA_INDEX_RELOAD_INTERVAL'],
+            warm_speller=app.config['QNA_FUZZY_MATCH'],
+            build=app.config['QNA_INDEX_BUILD'],
+        ).start()
+        app.extensions['qna_index'] = index_manager
+        return LocalQnAService.from_config(app.config, index_manager)
+    if backend == 'azure':
+        from app.services.qna_service import QnAService
+        return QnAService.from_config(app.config)
+    raise ValueError(f"QNA_BACKEND tidak dikenal: {backend!r} (pilihan: {', '.join(QNA_BACKENDS)})")
+
+
+def _create_router(app, retrieval):
+    from app.services.answer_router import AnswerRouter, ChitchatTier
+    config = app.config
+
+    chitchat = None
+    if config['CHITCHAT_DATASET']:
+        index_manager = app.extensions.get('qna_index')
+        if index_manager is not None:
+            chitchat = ChitchatTier.from_index_manager(index_manager, config['CHITCHAT_DATASET'])
+        else:
+            from app.services.qna_index import load_qna_records
+            chitchat = ChitchatTier.from_records(
+                load_qna_records(config['QNA_DATASETS_DIR'], (config['CHITCHAT_DATASET'],)))
+
+    llm = None
+    if config['LLM_BACKEND_URL']:
+        from app.services.llm_service import OllamaAnswerer
+        llm = OllamaAnswerer.from_config(config)
+
+    return AnswerRouter(
+        retrieval,
+        config['CONFIDENCE_THRESHOLD'],
+        chitchat=chitchat,
+        llm=llm,
+        latency_budget=config['ANSWER_LATENCY_BUDGET'],
+        fallback_min_confidence=config['LLM_FALLBACK_MIN_CONFIDENCE'],
+    )
+
+
+def get_qna_service():
+    return current_app.extensions['qna_service']
@@ -0,0 +1,209 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from app.metrics import note_answer_tier
+
+# Singkatan/bahasa gaul yang sering diketik siswa, dipetakan ke bentuk bakunya.
+SLANG_MAP = {
+    'yg': 'yang', 'dgn': 'dengan', 'dg': 'dengan', 'utk': 'untuk', 'untk': 'untuk',
+    'dr': 'dari', 'krn': 'karena', 'karna': 'karena', 'tdk': 'tidak', 'gak': 'tidak',
+    'ga': 'tidak', 'nggak': 'tidak', 'ngga': 'tidak', 'enggak': 'tidak', 'gk': 'tidak',
+    'sm': 'sama', 'jd': 'jadi', 'jg': 'juga', 'aja': 'saja', 'udah': 'sudah',
+    'sdh': 'sudah', 'blm': 'belum', 'bgt': 'banget', 'gmn': 'bagaimana',
+    'gimana': 'bagaimana', 'gmna': 'bagaimana', 'knp': 'kenapa', 'napa': 'kenapa',
+    'apaan': 'apa', 'tu': 'itu', 'ni': 'ini', 'pd': 'pada', 'dlm': 'dalam',
+    'bs': 'bisa', 'bsa': 'bisa', 'sy': 'saya', 'aku': 'saya', 'klo': 'kalau',
+    'kalo': 'kalau', 'org': 'orang', 'ttg': 'tentang', 'tntg': 'tentang',
+}
+
+# Partikel yang tidak mengubah makna pertanyaan.
+FILLER_WORDS = frozenset({'sih', 'dong', 'deh', 'nih', 'kak', 'ya', 'yah', 'kah', 'tuh'})
+
+_non_word = re.compile(r'[^\w]+')
+
+
+def normalize_question(text):
+    """'Apa itu  fotosintesis??' dan 'apa itu fotosintesis' menghasilkan kunci yang sama."""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    words = []
+    for word in _non_word.sub(' ', text).replace('_', ' ').split():
+        word = SLANG_MAP.get(word, word)
+        if word not in FILLER_WORDS:
+            words.append(word)
+    return ' '.join(words)
+
+
+class _InFlight:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class AnswerCache:
+    """Cache LRU ber-TTL dengan single-flight: miss yang identik dan bersamaan
+    hanya memicu satu kali komputasi, sisanya menunggu hasil yang sama."""
+
+    def __init__(self, maxsize=1024, ttl=600.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.uncacheable = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _ = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value):
+        self._entries[key] = (self.clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_compute(self, key, compute, should_cache=lambda value: True):
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[1]
+            flight = self._in_flight.get(key)
+            if flight is None:
+                self.misses += 1
+                flight = self._in_flight[key] = _InFlight()
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None:
+                    if should_cache(flight.result):
+                        self._store(key, flight.result)
+                    else:
+                        self.uncacheable += 1
+                del self._in_flight[key]
+            flight.done.set()
+        return flight.result
+
+    def get(self, key):
+        """Nilai tersimpan atau None; berbeda dengan get_or_compute, miss tidak ditunggu
+        atau digabung (dipakai jalur stream yang menghitung jawabannya sendiri)."""
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'uncacheable': self.uncacheable,
+                'hit_ratio': round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            }
+
+
+class CachedQnAService:
+    """Membungkus AnswerRouter dengan cache jawaban. Yang disimpan ditentukan
+    router.cacheable(): jawaban di atas ambang dan jawaban LLM, sedangkan fallback
+    low-confidence dan pesan gangguan selalu dicoba ulang.
+
+    version() (mis. versi snapshot indeks) ikut menjadi kunci: setelah hot reload,
+    jawaban dari dataset lama tidak dipakai lagi dan tersingkir lewat LRU/TTL.
+    """
+
+    def __init__(self, service, cache, version=lambda: None):
+        self.service = service
+        self.cache = cache
+        self.version = version
+
+    def __getattr__(self, name):
+        return getattr(self.service, name)
+
+    def _key(self, question_text):
+        return self.version(), normalize_question(question_text)
+
+    def get_answer(self, question_text):
+        computed = []
+
+        def compute():
+            computed.append(True)
+            return self.service.route(question_text)
+
+        result = self.cache.get_or_compute(
+            self._key(question_text),
+            compute,
+            should_cache=self.service.cacheable,
+        )
+        if not computed:
+            note_answer_tier('cache')
+        return result['answer'], result['confidence']
+
+    def stream_answer(self, question_text, cancel=None):
+        key = self._key(question_text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            note_answer_tier('cache')
+            yield 'token', cached['answer']
+            yield 'done', {**cached, 'tier': 'cache', 'timings': {}}
+            return
+
+        for event, data in self.service.stream_answer(question_text, cancel=cancel):
+            if event == 'done' and self.service.cacheable(data):
+                self.cache.put(key, data)
+            yield event, data
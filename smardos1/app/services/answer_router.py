@@ -0,0 +1,216 @@
+import time
+
+from app.metrics import note_answer_tier, span
+from app.services.answer_cache import normalize_question
+from app.services.llm_service import LLMStreamInterrupted
+
+TIER_CHITCHAT = 'chitchat'
+TIER_RETRIEVAL = 'retrieval'
+TIER_LLM = 'llm'
+TIER_FALLBACK = 'fallback'
+
+
+class ChitchatTier:
+    """Lookup O(1) untuk sapaan/basa-basi ("Halo", "Kamu siapa?", "Terima kasih").
+
+    Tabel dibangun ulang hanya jika version() berubah, misalnya setelah snapshot
+    indeks dimuat ulang; pairs() menghasilkan pasangan (pertanyaan, jawaban).
+    """
+
+    def __init__(self, pairs, version=lambda: None):
+        self.pairs = pairs
+        self.version = version
+        self._version = object()
+        self._answers = {}
+
+    @classmethod
+    def from_records(cls, records):
+        pairs = [(r['question'], r['answer']) for r in records]
+        return cls(lambda: pairs)
+
+    @classmethod
+    def from_index_manager(cls, index_manager, dataset):
+        def pairs():
+            index = index_manager.current
+            return [
+                (index.question_at(position), index.answer_at(position))
+                for position, source in enumerate(index.sources)
+                if source['dataset'] == dataset
+            ]
+
+        return cls(pairs, version=lambda: index_manager.current.version)
+
+    def _refresh(self):
+        version = self.version()
+        if version == self._version:
+            return
+        answers = {}
+        for question, answer in self.pairs():
+            # Baris pertama menang, sama seperti urutan di dataset.
+            answers.setdefault(normalize_question(question), answer)
+        self._answers = answers
+        self._version = version
+
+    def __len__(self):
+        self._refresh()
+        return len(self._answers)
+
+    def lookup(self, question_text):
+        self._refresh()
+        return self._answers.get(normalize_question(question_text))
+
+
+class AnswerRouter:
+    """Router bertingkat di belakang /ask: chitchat -> dataset (retrieval) -> LLM.
+
+    LLM hanya dipanggil jika confidence retrieval di bawah ambang, dengan batas waktu
+    sisa latency_budget. Jika LLM gagal atau waktunya habis, jawaban terbaik dataset
+    dipakai selama confidence-nya >= fallback_min_confidence.
+    """
+
+    def __init__(self, retrieval, confidence_threshold, chitchat=None, llm=None,
+                 latency_budget=8.0, fallback_min_confidence=0.3, min_llm_time=0.5, clock=time.perf_counter):
+        self.retrieval = retrieval
+        self.confidence_threshold = confidence_threshold
+        self.chitchat = chitchat
+        self.llm = llm
+        self.latency_budget = latency_budget
+        self.fallback_min_confidence = fallback_min_confidence
+        # Sisa anggaran di bawah ini tidak cukup untuk generasi yang berguna.
+        self.min_llm_time = min_llm_time
+        self.clock = clock
+
+    def __getattr__(self, name):
+        return getattr(self.retrieval, name)
+
+    def _finish(self, answer, confidence, source, tier, timings):
+        note_answer_tier(tier)
+        return {'answer': answer, 'confidence': confidence, 'source': source, 'tier': tier, 'timings': timings}
+
+    def _local_tiers(self, question_text, timings):
+        """Tier chitchat lalu retrieval. Return (tier, answer, confidence, source, best_answer);
+        tier None berarti confidence di bawah ambang dan tier LLM perlu dicoba."""
+        if self.chitchat is not None:
+            tier_started = self.clock()
+            with span('tier_chitchat'):
+                answer = self.chitchat.lookup(question_text)
+            timings[TIER_CHITCHAT] = self.clock() - tier_started
+            if answer is not None:
+                return TIER_CHITCHAT, answer, 1.0, {'tier': TIER_CHITCHAT}, None
+
+        tier_started = self.clock()
+        with span('tier_retrieval'):
+            answer, confidence, source, best_answer = self.retrieval.match(question_text)
+        timings[TIER_RETRIEVAL] = self.clock() - tier_started
+        if confidence >= self.confidence_threshold or self.llm is None:
+            return TIER_RETRIEVAL, answer, confidence, source, best_answer
+        return None, answer, confidence, source, best_answer
+
+    def _fallback(self, answer, confidence, best_answer):
+        # LLM gagal/kehabisan waktu: pakai kandidat dataset terbaik bila masih masuk akal.
+        if best_answer is not None and confidence >= self.fallback_min_confidence:
+            return best_answer
+        return answer
+
+    def _llm_hint(self, confidence, best_answer):
+        return best_answer if confidence >= self.fallback_min_confidence else None
+
+    def _llm_source(self, retrieval_confidence):
+        # Skor retrieval bukan ukuran mutu jawaban generatif; disimpan hanya sebagai konteks.
+        return {'tier': TIER_LLM, 'model': self.llm.model, 'retrieval_confidence': retrieval_confidence}
+
+    def cacheable(self, result):
+        """Jawaban LLM dan jawaban di atas ambang layak di-cache; fallback tidak, agar dicoba ulang."""
+        if result['tier'] == TIER_LLM:
+            return True
+        return result['confidence'] >= self.confidence_threshold
+
+    def route(self, question_text):
+        """Return dict berisi answer, confidence, source, tier, dan timings (detik per tier).
+
+        Jawaban tier LLM ber-confidence None: skor retrieval ada di source['retrieval_confidence'].
+        """
+        started = self.clock()
+        timings = {}
+        tier, answer, confidence, source, best_answer = self._local_tiers(question_text, timings)
+        if tier is not None:
+            return self._finish(answer, confidence, source, tier, timings)
+
+        remaining = self.latency_budget - (self.clock() - started)
+        if remaining >= self.min_llm_time:
+            tier_started = self.clock()
+            with span('tier_llm'):
+                llm_answer = self.llm.answer(question_text, timeout=remaining,
+                                             hint=self._llm_hint(confidence, best_answer))
+            timings[TIER_LLM] = self.clock() - tier_started
+            if llm_answer:
+                return self._finish(llm_answer, None, self._llm_source(confidence), TIER_LLM, timings)
+
+        return self._finish(self._fallback(answer, confidence, best_answer), confidence, source, TIER_FALLBACK,
+                            timings)
+
+    def stream_answer(self, question_text, cancel=None):
+        """Versi bertahap route(): yield ('token', teks) lalu satu ('done', hasil route).
+
+        Jawaban chitchat, dataset, dan fallback dikirim utuh sebagai satu token; hanya
+        tier LLM yang diteruskan per token. Sisa latency_budget menjadi batas waktu ke
+        token pertama. Jika cancel sudah dipicu (klien pergi), tidak ada 'done'.
+        Jika stream LLM putus setelah sebagian token terkirim, 'done' membawa jawaban
+        fallback yang harus menggantikan teks parsial; jawaban di 'done' selalu final.
+        """
+        started = self.clock()
+        timings = {}
+        tier, answer, confidence, source, best_answer = self._local_tiers(question_text, timings)
+        if tier is None:
+            remaining = self.latency_budget - (self.clock() - started)
+            parts = []
+            interrupted = False
+            if remaining >= self.min_llm_time:
+                tier_started = self.clock()
+                with span('tier_llm'):
+                    try:
+                        for token in self.llm.stream(question_text, timeout=remaining,
+                                                     hint=self._llm_hint(confidence, best_answer), cancel=cancel):
+                            parts.append(token)
+                            yield 'token', token
+                    except LLMStreamInterrupted:
+                        interrupted = True
+                timings[TIER_LLM] = self.clock() - tier_started
+                if cancel is not None and cancel.cancelled:
+                    return
+                llm_answer = ''.join(parts).strip()
+                if llm_answer and not interrupted:
+                    yield 'done', self._finish(llm_answer, None, self._llm_source(confidence), TIER_LLM, timings)
+                    return
+            tier, answer = TIER_FALLBACK, self._fallback(answer, confidence, best_answer)
+            if parts:
+                # Klien sudah menampilkan teks parsial; jawaban di 'done' menggantikannya.
+                yield 'done', self._finish(answer, confidence, source, tier, timings)
+                return
+
+        yield 'token', answer
+        yield 'done', self._finish(answer, confidence, source, tier, timings)
+
+    def get_answer(self, question_text):
+        result = self.route(question_text)
+        return result['answer'], result['confidence']
+
+    def get_answers(self, questions):
+        """Versi batch: chitchat lalu satu panggilan retrieval untuk sisanya; tanpa tier LLM
+        agar ratusan pertanyaan tidak menunggu generasi satu per satu."""
+        results = [None] * len(questions)
+        pending = []
+        for i, question in enumerate(questions):
+            answer = self.chitchat.lookup(question) if self.chitchat is not None else None
+            if answer is not None:
+                results[i] = {'question': question, 'answer': answer, 'confidence': 1.0,
+                              'source': {'tier': TIER_CHITCHAT}, 'tier': TIER_CHITCHAT}
+            else:
+                pending.append(i)
+
+        if pending:
+            with span('tier_retrieval'):
+                answers = self.retrieval.get_answers([questions[i] for i in pending])
+            for i, answer in zip(pending, answers):
+                results[i] = {**answer, 'tier': TIER_RETRIEVAL}
+        return results
@@ -0,0 +1,129 @@
+import re
+import unicodedata
+
+_word = re.compile(r'\w+')
+
+# Kata sependek ini terlalu ambigu untuk dikoreksi ("itu" -> "ini", "apa" -> "ada").
+MIN_WORD_LENGTH = 4
+MAX_CANDIDATES = 50
+
+
+def normalize_words(text):
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _word.findall(text)
+
+
+def max_edits(word):
+    return 1 if len(word) <= 5 else 2
+
+
+def _trigrams(word):
+    padded = f'${word}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_edit_distance(a, b, max_distance):
+    """Jarak Damerau-Levenshtein (OSA) antara a dan b, atau max_distance + 1 jika melebihinya.
+
+    Hanya pita selebar 2*max_distance+1 di sekitar diagonal yang dihitung, dan
+    perhitungan berhenti begitu seluruh baris melewati batas.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if a == b:
+        return 0
+    too_far = max_distance + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [too_far] * (len(b) + 1)
+        current[0] = i
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        best = current[0] if low == 1 else too_far
+        for j in range(low, high + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = min(value, too_far)
+            best = min(best, current[j])
+        if best > max_distance:
+            return too_far
+        previous_previous, previous = previous, current
+    return min(previous[len(b)], too_far)
+
+
+class TrigramSpeller:
+    """Koreksi ejaan per kata lewat indeks terbalik trigram karakter atas kosakata dataset.
+
+    Kandidat hanya diambil dari posting trigram milik kata yang diketik, lalu disaring
+    dengan lemma q-gram (satu edit, termasuk transposisi, merusak paling banyak 4
+    trigram) sebelum jarak edit dihitung, jadi lookup tidak memindai seluruh kosakata.
+    """
+
+    def __init__(self, candidate_words, known_words=()):
+        counts = {}
+        for word in candidate_words:
+            counts[word] = counts.get(word, 0) + 1
+        self.words = [word for word in counts if len(word) >= MIN_WORD_LENGTH]
+        self.frequency = [counts[word] for word in self.words]
+        self.known = set(counts) | set(known_words)
+        self.grams = [frozenset(_trigrams(word)) for word in self.words]
+        self.postings = {}
+        for word_id, grams in enumerate(self.grams):
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(word_id)
+
+    @classmethod
+    def from_texts(cls, questions, answers=()):
+        """Kandidat koreksi dari pertanyaan; kata di jawaban cukup dianggap benar."""
+        candidates = [word for text in questions for word in normalize_words(text)]
+        known = {word for text in answers for word in normalize_words(text)}
+        return cls(candidates, known)
+
+    def correct_word(self, word):
+        if word in self.known or len(word) < MIN_WORD_LENGTH or word.isdigit():
+            return word
+        limit = max_edits(word)
+        grams = _trigrams(word)
+        required = max(1, len(grams) - 4 * limit)
+        # Prefix filter: kata yang berbagi >= required trigram pasti muncul di salah satu
+        # dari (len - required + 1) posting terpendek, jadi posting panjang ("an$") dilewati.
+        ordered = sorted(grams, key=lambda gram: len(self.postings.get(gram, ())))
+        candidate_ids = set()
+        for gram in ordered[:len(ordered) - required + 1]:
+            candidate_ids.update(self.postings.get(gram, ()))
+
+        candidates = []
+        for word_id in candidate_ids:
+            if abs(len(self.words[word_id]) - len(word)) > limit:
+                continue
+            shared = len(grams & self.grams[word_id])
+            if shared >= required:
+                candidates.append((shared, word_id))
+        # Urut dari trigram bersama terbanyak; jarak minimal kandidat >= (|trigram| - bersama) / 4,
+        # jadi iterasi bisa berhenti begitu batas bawah itu melewati jarak terbaik.
+        candidates.sort(reverse=True)
+
+        best = None
+        for shared, word_id in candidates[:MAX_CANDIDATES]:
+            if best is not None and -(-(len(grams) - shared) // 4) > best[0][0]:
+                break
+            distance = bounded_edit_distance(word, self.words[word_id], limit)
+            if distance > limit:
+                continue
+            key = (distance, -self.frequency[word_id])
+            if best is None or key < best[0]:
+                best = (key, self.words[word_id])
+        return best[1] if best is not None else word
+
+    def correct(self, text):
+        """Return teks dengan kata yang salah eja diganti, atau None jika tidak ada yang berubah."""
+        words = normalize_words(text)
+        corrected = [self.correct_word(word) for word in words]
+        if corrected == words:
+            return None
+        return ' '.join(corrected)
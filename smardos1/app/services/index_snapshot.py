@@ -0,0 +1,309 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from app.services.qna_index import CharNgramVectorizer, DATASET_FILES, QnAIndex, load_qna_records
+
+logger = logging.getLogger(__name__)
+
+# Naikkan jika tata letak berkas snapshot berubah; snapshot lama otomatis dianggap basi.
+SNAPSHOT_FORMAT = 2
+CURRENT_POINTER = 'CURRENT'
+
+
+class MappedStrings:
+    """Daftar string read-only di atas blob UTF-8 + array offset (keduanya memory-mapped)."""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return bytes(self.blob[start:end]).decode('utf-8')
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+
+def _write_strings(directory, name, values):
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    with open(os.path.join(directory, f'{name}.bin'), 'wb') as f:
+        f.write(b''.join(encoded))
+    np.save(os.path.join(directory, f'{name}_offsets.npy'), offsets)
+
+
+def _read_strings(directory, name):
+    path = os.path.join(directory, f'{name}.bin')
+    offsets = np.load(os.path.join(directory, f'{name}_offsets.npy'), mmap_mode='r')
+    # np.memmap menolak berkas kosong, jadi blob kosong cukup diwakili bytes kosong.
+    blob = np.memmap(path, dtype=np.uint8, mode='r') if os.path.getsize(path) else b''
+    return MappedStrings(blob, offsets)
+
+
+def dataset_stat(datasets_dir, files=DATASET_FILES):
+    """Tanda tangan murah (mtime, ukuran) untuk polling; hash baru dihitung jika ini berubah."""
+    signature = []
+    for filename in files:
+        st = os.stat(os.path.join(datasets_dir, filename))
+        signature.append((filename, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def dataset_fingerprint(datasets_dir, files=DATASET_FILES):
+    digest = hashlib.sha256(f'format={SNAPSHOT_FORMAT}'.encode())
+    for filename in files:
+        digest.update(filename.encode())
+        with open(os.path.join(datasets_dir, filename), 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def snapshot_version(fingerprint):
+    return f'v{SNAPSHOT_FORMAT}-{fingerprint[:16]}'
+
+
+def read_current_version(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_POINTER)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _point_current(snapshot_dir, version):
+    fd, tmp_path = tempfile.mkstemp(dir=snapshot_dir, prefix='.current-')
+    with os.fdopen(fd, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(snapshot_dir, CURRENT_POINTER))
+
+
+def build_snapshot(datasets_dir, snapshot_dir, files=DATASET_FILES, force=False):
+    """Kompilasi dataset menjadi snapshot berversi lalu arahkan CURRENT ke sana.
+
+    Aman dijalankan bersamaan oleh beberapa worker: tiap build ditulis ke direktori
+    sementara dan di-rename secara atomik; pemenang rename dipakai semua worker.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    fingerprint = dataset_fingerprint(datasets_dir, files)
+    version = snapshot_version(fingerprint)
+    target = os.path.join(snapshot_dir, version)
+
+    if force and os.path.isdir(target):
+        shutil.rmtree(target, ignore_errors=True)
+
+    if not os.path.isdir(target):
+        started = time.perf_counter()
+        index = QnAIndex.build(load_qna_records(datasets_dir, files))
+        staging = tempfile.mkdtemp(dir=snapshot_dir, prefix=f'.{version}-')
+        try:
+            matrix = index.matrix
+            np.save(os.path.join(staging, 'data.npy'), matrix.data.astype(np.float32, copy=False))
+            np.save(os.path.join(staging, 'indices.npy'), matrix.indices.astype(np.int32, copy=False))
+            np.save(os.path.join(staging, 'indptr.npy'), matrix.indptr.astype(np.int32, copy=False))
+            np.save(os.path.join(staging, 'idf.npy'), index.vectorizer.idf_.astype(np.float32, copy=False))
+            vocabulary = {term: int(column) for term, column in index.vectorizer.vocabulary_.items()}
+            with open(os.path.join(staging, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+                json.dump(vocabulary, f, ensure_ascii=False)
+            _write_strings(staging, 'questions', index.questions)
+            _write_strings(staging, 'answers', index.answers)
+            with open(os.path.join(staging, 'sources.json'), 'w', encoding='utf-8') as f:
+                json.dump(index.sources, f, ensure_ascii=False)
+            meta = {
+                'format': SNAPSHOT_FORMAT,
+                'version': version,
+                'fingerprint': fingerprint,
+                'files': list(files),
+                'shape': list(matrix.shape),
+                'built_at': time.time(),
+            }
+            with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, indent=2)
+            os.rename(staging, target)
+            logger.info("Snapshot QnA %s dibangun dalam %.2fs (%d baris)",
+                        version, time.perf_counter() - started, matrix.shape[0])
+        except OSError:
+            # Worker lain mungkin sudah lebih dulu me-rename versi yang sama.
+            if not os.path.isdir(target):
+                raise
+        finally:
+            if os.path.isdir(staging):
+                shutil.rmtree(staging, ignore_errors=True)
+
+    _point_current(snapshot_dir, version)
+    return version
+
+
+def load_snapshot(snapshot_dir, version):
+    directory = os.path.join(snapshot_dir, version)
+    with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"Format snapshot {version} tidak didukung: {meta.get('format')}")
+
+    with open(os.path.join(directory, 'vocabulary.json'), encoding='utf-8') as f:
+        vocabulary = json.load(f)
+    vectorizer = CharNgramVectorizer(vocabulary, np.load(os.path.join(directory, 'idf.npy'), mmap_mode='r'))
+
+    # copy=False + dtype yang sudah cocok: scipy memakai array memmap apa adanya,
+    # sehingga halaman matriks dibagi lewat page cache antar worker gunicorn.
+    matrix = sp.csr_matrix(
+        (
+            np.load(os.path.join(directory, 'data.npy'), mmap_mode='r'),
+            np.load(os.path.join(directory, 'indices.npy'), mmap_mode='r'),
+            np.load(os.path.join(directory, 'indptr.npy'), mmap_mode='r'),
+        ),
+        shape=tuple(meta['shape']),
+        copy=False,
+    )
+    with open(os.path.join(directory, 'sources.json'), encoding='utf-8') as f:
+        sources = json.load(f)
+
+    return QnAIndex(
+        vectorizer,
+        matrix,
+        _read_strings(directory, 'questions'),
+        _read_strings(directory, 'answers'),
+        sources,
+        version=version,
+    )
+
+
+def prune_snapshots(snapshot_dir, keep=3):
+    """Hapus versi lama; versi yang sedang CURRENT tidak pernah dihapus."""
+    current = read_current_version(snapshot_dir)
+    versions = [
+        name for name in os.listdir(snapshot_dir)
+        if name.startswith('v') and os.path.isdir(os.path.join(snapshot_dir, name))
+    ]
+    versions.sort(key=lambda name: os.path.getmtime(os.path.join(snapshot_dir, name)), reverse=True)
+    for name in versions[keep:]:
+        if name != current:
+            shutil.rmtree(os.path.join(snapshot_dir, name), ignore_errors=True)
+
+
+class SnapshotBuilder:
+    """Bangun snapshot baru setiap kali dataset berubah.
+
+    Dipakai IndexManager di proses tunggal (flask run), atau sebagai satu-satunya
+    pembangun di master gunicorn (lihat gunicorn.conf.py): parsing Excel dan fit TF-IDF
+    lalu berjalan sekali per perubahan, bukan di event loop setiap worker gevent.
+    """
+
+    def __init__(self, datasets_dir, snapshot_dir, files=DATASET_FILES, reload_interval=0):
+        self.datasets_dir = datasets_dir
+        self.snapshot_dir = snapshot_dir
+        self.files = files
+        self.reload_interval = reload_interval
+        self._stat = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def build_if_changed(self):
+        """Return versi CURRENT, setelah membangunnya jika dataset berubah."""
+        stat = dataset_stat(self.datasets_dir, self.files)
+        current = read_current_version(self.snapshot_dir)
+        if stat != self._stat or current is None:
+            version = snapshot_version(dataset_fingerprint(self.datasets_dir, self.files))
+            if version != current or not os.path.isdir(os.path.join(self.snapshot_dir, version)):
+                current = build_snapshot(self.datasets_dir, self.snapshot_dir, self.files)
+                prune_snapshots(self.snapshot_dir)
+            self._stat = stat
+        return current
+
+    def start(self):
+        self.build_if_changed()
+        if self.reload_interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name='qna-index-builder', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            try:
+                self.build_if_changed()
+            except Exception:
+                logger.exception("Gagal membangun ulang snapshot QnA")
+
+
+class IndexManager:
+    """Memegang indeks aktif dan menukarnya secara atomik ketika dataset berubah.
+
+    Request yang sedang berjalan tetap memakai objek indeks yang sudah diambilnya,
+    jadi pergantian snapshot tidak pernah memutus request. Dengan build=False proses
+    ini hanya memuat versi CURRENT yang dibangun proses lain (SnapshotBuilder).
+    """
+
+    def __init__(self, datasets_dir, snapshot_dir, files=DATASET_FILES, reload_interval=0, warm_speller=False,
+                 build=True):
+        self.datasets_dir = datasets_dir
+        self.snapshot_dir = snapshot_dir
+        self.files = files
+        self.reload_interval = reload_interval
+        # Bangun indeks koreksi ejaan sebelum indeks baru dipasang, bukan di request pertama.
+        self.warm_speller = warm_speller
+        self.builder = SnapshotBuilder(datasets_dir, snapshot_dir, files) if build else None
+        self._index = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def current(self):
+        return self._index
+
+    def start(self):
+        self.refresh()
+        if self.reload_interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name='qna-index-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def refresh(self):
+        """Bangun ulang jika dataset berubah (hanya jika build), lalu muat versi CURRENT jika berbeda."""
+        with self._lock:
+            if self.builder is not None:
+                current = self.builder.build_if_changed()
+            else:
+                current = read_current_version(self.snapshot_dir)
+                if current is None:
+                    # Pembangun belum sempat jalan (mis. dijalankan tanpa hook master): jangan mati.
+                    logger.warning("Belum ada snapshot QnA di %s; dibangun oleh proses ini", self.snapshot_dir)
+                    current = build_snapshot(self.datasets_dir, self.snapshot_dir, self.files)
+
+            if self._index is None or self._index.version != current:
+                index = load_snapshot(self.snapshot_dir, current)
+                if self.warm_speller:
+                    index.speller
+                self._index = index
+                logger.info("Snapshot QnA %s dimuat", current)
+        return self._index
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            try:
+                self.refresh()
+            except Exception:
+                # Indeks lama tetap melayani request; coba lagi pada putaran berikutnya.
+                logger.exception("Gagal memuat ulang snapshot QnA")
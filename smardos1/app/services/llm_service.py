@@ -0,0 +1,151 @@
+import json
+import logging
+
+import requests
+
+from app.metrics import QNA_UPSTREAM_ERRORS, REQUEST_ID_HEADER, current_request_id
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.qna_service import build_session, classify_request_error
+
+logger = logging.getLogger(__name__)
+
+LLM_SYSTEM_PROMPT = (
+    "Kamu adalah EduPintar IPAS, teman belajar siswa SD kelas 6. "
+    "Jawab dalam Bahasa Indonesia yang sederhana dan ramah, maksimal 3 kalimat. "
+    "Jika pertanyaan tidak berhubungan dengan pelajaran IPA atau IPS, tolak dengan sopan."
+)
+
+
+class LLMStreamInterrupted(Exception):
+    """Stream LLM gagal setelah sebagian jawaban terkirim; teksnya tidak lengkap."""
+
+
+class OllamaAnswerer:
+    """Tier terakhir router: tanya LLM (API /api/generate Ollama) dengan batas waktu dari anggaran request."""
+
+    def __init__(self, base_url, model, max_tokens=256, session=None, breaker=None, keep_alive='30m'):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.max_tokens = max_tokens
+        self.keep_alive = keep_alive
+        # Tanpa retry: sisa anggaran waktu tidak cukup untuk mengulang generasi.
+        self.session = session if session is not None else build_session(max_retries=0)
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config['LLM_BACKEND_URL'],
+            config['LLM_MODEL'],
+            max_tokens=config['LLM_MAX_TOKENS'],
+            session=build_session(pool_size=config['QNA_HTTP_POOL_SIZE'], max_retries=0),
+            breaker=CircuitBreaker(config['QNA_BREAKER_FAILURES'], config['QNA_BREAKER_RESET']),
+        )
+
+    def build_prompt(self, question, hint=None):
+        parts = [LLM_SYSTEM_PROMPT]
+        if hint:
+            # Kandidat terbaik dari dataset, walau di bawah ambang, membantu model tetap pada materi.
+            parts.append(f"Materi yang mungkin terkait:\n{hint}")
+        parts.append(f"Pertanyaan siswa: {question}\nJawaban:")
+        return "\n\n".join(parts)
+
+    def _request(self, question, hint, stream):
+        request_id = current_request_id()
+        payload = {
+            'model': self.model,
+            'prompt': self.build_prompt(question, hint),
+            'stream': stream,
+            'keep_alive': self.keep_alive,
+            'options': {'num_predict': self.max_tokens, 'temperature': 0.3},
+        }
+        return request_id, payload, {REQUEST_ID_HEADER: request_id} if request_id else None
+
+    def answer(self, question, timeout, hint=None):
+        """Return teks jawaban, atau None jika gagal/melewati timeout (detik)."""
+        if not self.breaker.allow_request():
+            QNA_UPSTREAM_ERRORS.inc('llm_circuit_open')
+            return None
+
+        request_id, payload, headers = self._request(question, hint, stream=False)
+        try:
+            # stream=False: Ollama baru mengirim byte setelah selesai, jadi read timeout = batas total.
+            response = self.session.post(
+                f'{self.base_url}/api/generate',
+                json=payload,
+                timeout=timeout,
+                headers=headers,
+            )
+            response.raise_for_status()
+            text = (response.json().get('response') or '').strip()
+        except requests.exceptions.RequestException as e:
+            self.breaker.record_failure()
+            QNA_UPSTREAM_ERRORS.inc(f'llm_{classify_request_error(e)}')
+            logger.warning(f"LLM fallback gagal (request {request_id}): {e}")
+            return None
+
+        self.breaker.record_success()
+        return text or None
+
+    def stream(self, question, timeout, hint=None, cancel=None):
+        """Yield potongan teks jawaban begitu dikirim Ollama (NDJSON stream=True).
+
+        timeout berlaku per pembacaan, jadi membatasi waktu ke token pertama dan jeda
+        antar token, bukan panjang jawaban. Saat cancel dipicu, respons upstream
+        ditutup; Ollama melihat koneksinya putus dan berhenti membangkitkan token.
+        Kegagalan sebelum token pertama tidak dilempar (generator berhenti kosong dan
+        pemanggil memakai fallback); kegagalan setelahnya, termasuk stream yang putus
+        tanpa penanda done, dilempar sebagai LLMStreamInterrupted.
+        """
+        if not self.breaker.allow_request():
+            QNA_UPSTREAM_ERRORS.inc('llm_circuit_open')
+            return
+
+        request_id, payload, headers = self._request(question, hint, stream=True)
+        emitted = False
+        outcome = None
+        try:
+            with self.session.post(
+                f'{self.base_url}/api/generate',
+                json=payload,
+                timeout=timeout,
+                headers=headers,
+                stream=True,
+            ) as response:
+                if cancel is not None:
+                    cancel.add_callback(response.close)
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        raise requests.exceptions.RequestException(chunk['error'])
+                    if chunk.get('response'):
+                        emitted = True
+                        yield chunk['response']
+                    if chunk.get('done'):
+                        outcome = 'success'
+                        return
+                raise requests.exceptions.ChunkedEncodingError('stream berakhir tanpa penanda done')
+        except Exception as e:
+            if cancel is not None and cancel.cancelled:
+                # Respons sengaja ditutup karena klien pergi; bukan kegagalan upstream.
+                return
+            if not isinstance(e, (requests.exceptions.RequestException, ValueError)):
+                raise
+            outcome = 'failure'
+            kind = classify_request_error(e) if isinstance(e, requests.exceptions.RequestException) else 'invalid_json'
+            QNA_UPSTREAM_ERRORS.inc(f'llm_{kind}')
+            logger.warning(f"Stream LLM gagal (request {request_id}): {e}")
+            if emitted:
+                raise LLMStreamInterrupted(str(e)) from e
+        finally:
+            # Setiap jalan keluar harus menutup percobaan half-open, termasuk pembatalan
+            # (GeneratorExit) yang tidak menilai upstream sama sekali.
+            if outcome == 'success':
+                self.breaker.record_success()
+            elif outcome == 'failure':
+                self.breaker.record_failure()
+            else:
+                self.breaker.release_probe()
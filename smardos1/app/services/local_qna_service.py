@@ -0,0 +1,50 @@
+from app.metrics import record_answer, span
+from app.services.qna_service import LOW_CONFIDENCE_MESSAGE
+
+
+class LocalQnAService:
+
+    def __init__(self, index_manager, confidence_threshold, fuzzy=True):
+        self.index_manager = index_manager
+        self.confidence_threshold = confidence_threshold
+        # Koreksi salah ketik hanya dicoba untuk pertanyaan yang belum lolos ambang.
+        self.fuzzy_below = confidence_threshold if fuzzy else None
+
+    @classmethod
+    def from_config(cls, config, index_manager):
+        return cls(index_manager, config['CONFIDENCE_THRESHOLD'], fuzzy=config['QNA_FUZZY_MATCH'])
+
+    def get_answer(self, question_text):
+        answer_text, confidence, _, _ = self.match(question_text)
+        return answer_text, confidence
+
+    def match(self, question_text):
+        """Return (jawaban, confidence, source, jawaban_terbaik) tanpa membuang kandidat di bawah ambang."""
+        # Ambil referensi indeks sekali per panggilan; hot reload cukup menukar referensi ini.
+        index = self.index_manager.current
+        with span('search'):
+            position, confidence = index.search(question_text, self.fuzzy_below)
+        record_answer('local', confidence, self.confidence_threshold)
+        best_answer = index.answer_at(position)
+        source = {**index.source_at(position), 'question': index.question_at(position)}
+        if confidence >= self.confidence_threshold:
+            return best_answer, confidence, source, best_answer
+        return LOW_CONFIDENCE_MESSAGE, confidence, source, best_answer
+
+    def get_answers(self, questions):
+        """Jawab banyak pertanyaan sekaligus dengan satu perkalian matriks."""
+        index = self.index_manager.current
+        with span('search_batch'):
+            positions, scores = index.search_many(questions, self.fuzzy_below)
+        results = []
+        for question, position, confidence in zip(questions, positions, scores):
+            confidence = float(confidence)
+            record_answer('local', confidence, self.confidence_threshold)
+            accepted = confidence >= self.confidence_threshold
+            results.append({
+                'question': question,
+                'answer': index.answer_at(position) if accepted else LOW_CONFIDENCE_MESSAGE,
+                'confidence': confidence,
+                'source': {**index.source_at(position), 'question': index.question_at(position)},
+            })
+        return results
@@ -0,0 +1,220 @@
+import os
+import re
+import unicodedata
+
+import numpy as np
+import scipy.sparse as sp
+
+DATASET_FILES = (
+    'ipa_kelas6_fullmateri.xlsx',
+    'ips_kelas6_fullmateri.xlsx',
+    'ipas_chitchat_edupintar.xlsx',
+)
+
+
+def load_qna_records(datasets_dir, files=DATASET_FILES):
+    """Baca semua sheet (Bab 1, Bab 2, ..., Ramah) yang punya kolom Question/Answer."""
+    # pandas/openpyxl hanya dibutuhkan saat build snapshot, bukan saat worker memuatnya.
+    import pandas as pd
+
+    records = []
+    for filename in files:
+        path = os.path.join(datasets_dir, filename)
+        sheets = pd.read_excel(path, sheet_name=None)
+        for sheet_name, df in sheets.items():
+            if 'Question' not in df.columns or 'Answer' not in df.columns:
+                continue
+            for row, (question, answer) in enumerate(zip(df['Question'], df['Answer']), start=2):
+                if pd.isna(question) or pd.isna(answer):
+                    continue
+                question = str(question).strip()
+                answer = str(answer).strip()
+                if not question or not answer:
+                    continue
+                records.append({
+                    'question': question,
+                    'answer': answer,
+                    'dataset': filename,
+                    'sheet': sheet_name,
+                    'row': row,
+                })
+    return records
+
+
+NGRAM_RANGE = (2, 4)
+
+# Kerangka kalimat tanya yang dipakai banyak baris dataset ("Apa yang dimaksud dengan
+# ...?", "Bagaimana cara ..."). Jika ikut divektorkan, kerangka ini mendominasi skor
+# sehingga pertanyaan di luar materi dengan kerangka sama tetap lolos ambang.
+QUESTION_STOP_WORDS = frozenset({
+    'apa', 'apakah', 'yang', 'dimaksud', 'maksud', 'maksudnya', 'dengan', 'itu', 'ini',
+    'bagaimana', 'cara', 'adalah', 'ialah', 'jelaskan', 'sebutkan', 'tentang', 'mengenai',
+    'pengertian', 'arti', 'artinya', 'disebut', 'saja', 'di', 'ke', 'dari', 'dan', 'atau',
+    'ya', 'sih', 'dong', 'kah', 'tolong', 'coba', 'kita', 'kami', 'saya', 'aku', 'kamu', 'bisa',
+})
+
+_word = re.compile(r'\w+')
+
+
+def question_terms(text):
+    """Kata isi pertanyaan tanpa kerangka tanya; teks aslinya jika tidak ada yang tersisa
+    (mis. chitchat "Kamu siapa?")."""
+    terms = [word for word in _word.findall(text) if word.casefold() not in QUESTION_STOP_WORDS]
+    return ' '.join(terms) if terms else text
+
+
+def make_vectorizer(**kwargs):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    # n-gram karakter lebih tahan terhadap variasi ejaan siswa daripada n-gram kata.
+    # Input-nya question_terms(), baik saat membangun indeks maupun saat mencari.
+    return TfidfVectorizer(
+        analyzer='char_wb',
+        ngram_range=NGRAM_RANGE,
+        strip_accents='unicode',
+        lowercase=True,
+        sublinear_tf=True,
+        dtype=np.float32,
+        **kwargs
+    )
+
+
+class CharNgramVectorizer:
+    """Transform-only setara TfidfVectorizer di atas, dari vocabulary + idf snapshot.
+
+    Worker yang memuat snapshot tidak perlu meng-import scikit-learn sama sekali.
+    """
+
+    _white_spaces = re.compile(r"\s\s+")
+
+    def __init__(self, vocabulary, idf, ngram_range=NGRAM_RANGE):
+        self.vocabulary_ = vocabulary
+        self.idf_ = idf
+        self.ngram_range = ngram_range
+
+    @staticmethod
+    def _preprocess(text):
+        text = text.lower()
+        if not text.isascii():
+            text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+        return text
+
+    def _ngrams(self, text):
+        min_n, max_n = self.ngram_range
+        for word in self._white_spaces.sub(" ", self._preprocess(text)).split():
+            word = f' {word} '
+            length = len(word)
+            for n in range(min_n, max_n + 1):
+                offset = 0
+                yield word[offset:offset + n]
+                while offset + n < length:
+                    offset += 1
+                    yield word[offset:offset + n]
+                if offset == 0:
+                    break
+
+    def transform(self, texts):
+        indptr = [0]
+        indices = []
+        values = []
+        for text in texts:
+            counts = {}
+            for gram in self._ngrams(text):
+                column = self.vocabulary_.get(gram)
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+            indices.extend(counts.keys())
+            values.extend(counts.values())
+            indptr.append(len(indices))
+
+        columns = np.asarray(indices, dtype=np.int32)
+        data = (np.log(np.asarray(values, dtype=np.float32)) + 1) * self.idf_[columns]
+        matrix = sp.csr_matrix((data, columns, indptr), shape=(len(texts), len(self.idf_)), dtype=np.float32)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1), dtype=np.float32)).ravel()
+        norms[norms == 0] = 1
+        return sp.csr_matrix(sp.diags(1 / norms) @ matrix, dtype=np.float32)
+
+
+class QnAIndex:
+
+    def __init__(self, vectorizer, matrix, questions, answers, sources, version=None):
+        self.vectorizer = vectorizer
+        # Baris matriks sudah ter-normalisasi L2 oleh TF-IDF, jadi hasil kali titik = kosinus.
+        self.matrix = matrix
+        self.questions = questions
+        self.answers = answers
+        self.sources = sources
+        self.version = version
+        self._speller = None
+
+    @classmethod
+    def build(cls, records):
+        if not records:
+            raise ValueError("Dataset QnA kosong, tidak ada pasangan Question/Answer yang bisa diindeks.")
+        vectorizer = make_vectorizer()
+        matrix = vectorizer.fit_transform([question_terms(r['question']) for r in records]).tocsr()
+        return cls(
+            vectorizer,
+            matrix,
+            [r['question'] for r in records],
+            [r['answer'] for r in records],
+            [{'dataset': r['dataset'], 'sheet': r['sheet'], 'row': r['row']} for r in records],
+        )
+
+    @classmethod
+    def from_datasets(cls, datasets_dir, files=DATASET_FILES):
+        return cls.build(load_qna_records(datasets_dir, files))
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def score(self, questions):
+        """Matriks skor sparse (jumlah pertanyaan x jumlah baris indeks) dalam satu perkalian."""
+        query = self.vectorizer.transform([question_terms(question) for question in questions])
+        return (query @ self.matrix.T).tocsr()
+
+    @property
+    def speller(self):
+        # Dibangun sekali per versi snapshot; IndexManager memanaskannya di luar jalur request.
+        if self._speller is None:
+            from app.services.fuzzy import TrigramSpeller
+            self._speller = TrigramSpeller.from_texts(self.questions, self.answers)
+        return self._speller
+
+    def search_many(self, questions, fuzzy_below=None):
+        """Baris terbaik + skornya per pertanyaan.
+
+        Pertanyaan dengan skor < fuzzy_below dicari ulang setelah kata yang salah eja
+        dikoreksi ke kosakata dataset; skor yang lebih tinggi yang dipakai.
+        """
+        # argmax/max langsung di matriks sparse: batch besar tidak perlu matriks padat.
+        scores = self.score(questions)
+        best = np.asarray(scores.argmax(axis=1)).ravel()
+        # Pembulatan float32 bisa memberi 1.0000001 untuk kecocokan persis.
+        top = np.minimum(scores.max(axis=1).toarray().ravel(), 1.0)
+
+        if fuzzy_below is not None:
+            retry = []
+            for position in np.flatnonzero(top < fuzzy_below):
+                corrected = self.speller.correct(questions[position])
+                if corrected is not None:
+                    retry.append((position, corrected))
+            if retry:
+                fuzzy_best, fuzzy_top = self.search_many([corrected for _, corrected in retry])
+                for (position, _), row, score in zip(retry, fuzzy_best, fuzzy_top):
+                    if score > top[position]:
+                        best[position], top[position] = row, score
+        return best, top
+
+    def search(self, question, fuzzy_below=None):
+        best, scores = self.search_many([question], fuzzy_below)
+        return int(best[0]), float(scores[0])
+
+    def answer_at(self, position):
+        return self.answers[position]
+
+    def source_at(self, position):
+        return self.sources[position]
+
+    def question_at(self, position):
+        return self.questions[position]
@@ -1,43 +1,160 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-import json
-from flask import current_app
+from requests.adapters import HTTPAdapter
+from urllib3 import exceptions as urllib3_exceptions
+from urllib3.util.retry import Retry
+
+from app.metrics import QNA_UPSTREAM_ERRORS, REQUEST_ID_HEADER, current_request_id, record_answer, span
+from app.services.circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANSWER_MESSAGE = "Maaf, aku belum mengerti pertanyaan itu."
+LOW_CONFIDENCE_MESSAGE = "Hmm, sepertinya aku belum bisa menjawab pertanyaan itu dengan pasti. Coba tanya yang lain tentang IPA ya!"
+NO_ANSWER_MESSAGE = "Maaf, aku tidak menemukan jawaban yang cocok untuk pertanyaanmu. Yuk, coba tanya tentang pelajaran IPA lainnya!"
+UPSTREAM_ERROR_MESSAGE = "Aduh, sepertinya ada sedikit gangguan. Coba tanya lagi nanti ya!"
+PARSE_ERROR_MESSAGE = "Oops, ada yang aneh dengan jawabannya. Tim teknis sedang diberitahu!"
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def classify_request_error(error):
+    """Jenis kegagalan untuk metrik: timeout, connection, http, invalid_json, atau other."""
+    # Setelah retry habis, timeout baca dibungkus urllib3 menjadi ConnectionError(MaxRetryError).
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    if isinstance(error, requests.exceptions.Timeout) or isinstance(reason, urllib3_exceptions.TimeoutError):
+        return 'timeout'
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return 'connection'
+    if isinstance(error, requests.exceptions.HTTPError):
+        return 'http'
+    if isinstance(error, requests.exceptions.JSONDecodeError):
+        return 'invalid_json'
+    return 'other'
+
+
+def build_session(pool_size=10, max_retries=2, backoff_factor=0.2, backoff_jitter=0.2):
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        status_forcelist=RETRY_STATUSES,
+        # Query QnA hanya membaca, jadi POST aman diulang.
+        allowed_methods=frozenset({'POST'}),
+        backoff_factor=backoff_factor,
+        backoff_jitter=backoff_jitter,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry, pool_block=False)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
 
 class QnAService:
 
-    def __init__(self):
-        self.endpoint = current_app.config['AZURE_QNA_ENDPOINT']
-        self.api_key = current_app.config['AZURE_QNA_KEY']
-        self.confidence_threshold = current_app.config['CONFIDENCE_THRESHOLD']
+    def __init__(self, endpoint, api_key, confidence_threshold, session=None, timeout=20, breaker=None,
+                 batch_workers=10):
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.confidence_threshold = confidence_threshold
+        self.timeout = timeout
+        self.session = session if session is not None else build_session()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        # Azure QnA hanya menerima satu pertanyaan per request, jadi batch disebar ke
+        # thread sebanyak ukuran pool koneksi.
+        self.batch_workers = batch_workers
+        # Dibuat sekali di sini (thread-nya baru dijalankan saat dipakai), bukan saat batch
+        # pertama, agar dua /ask/batch bersamaan tidak masing-masing membuat executor.
+        self._executor = ThreadPoolExecutor(max_workers=batch_workers, thread_name_prefix='qna-batch')
+        self.session.headers.update({
+            "Ocp-Apim-Subscription-Key": self.api_key or '',
+            "Content-Type": "application/json"
+        })
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config['AZURE_QNA_ENDPOINT'],
+            config['AZURE_QNA_KEY'],
+            config['CONFIDENCE_THRESHOLD'],
+            session=build_session(
+                pool_size=config['QNA_HTTP_POOL_SIZE'],
+                max_retries=config['QNA_HTTP_RETRIES'],
+                backoff_factor=config['QNA_HTTP_BACKOFF'],
+                backoff_jitter=config['QNA_HTTP_BACKOFF'],
+            ),
+            timeout=config['QNA_HTTP_TIMEOUT'],
+            breaker=CircuitBreaker(config['QNA_BREAKER_FAILURES'], config['QNA_BREAKER_RESET']),
+            batch_workers=config['QNA_HTTP_POOL_SIZE'],
+        )
 
     def get_answer(self, question_text):
-        headers = {
-            "Ocp-Apim-Subscription-Key": self.api_key,
-            "Content-Type": "application/json"
-        }
+        answer_text, confidence, _, _ = self._ask(question_text)
+        return answer_text, confidence
+
+    def match(self, question_text):
+        """Return (jawaban, confidence, source, jawaban_terbaik) tanpa membuang kandidat di bawah ambang."""
+        return self._ask(question_text)
+
+    def get_answers(self, questions):
+        # Thread batch tidak mewarisi context request, jadi request ID diteruskan eksplisit.
+        request_ids = [current_request_id()] * len(questions)
+        results = []
+        asked = self._executor.map(self._ask, questions, request_ids)
+        for question, (answer_text, confidence, source, _) in zip(questions, asked):
+            results.append({'question': question, 'answer': answer_text, 'confidence': confidence, 'source': source})
+        return results
+
+    def _ask(self, question_text, request_id=None):
+        if not self.breaker.allow_request():
+            # Upstream sedang dianggap mati: langsung jawab tanpa menunggu timeout.
+            QNA_UPSTREAM_ERRORS.inc('circuit_open')
+            return UPSTREAM_ERROR_MESSAGE, 0, None, None
+
         payload = {
             "question": question_text,
             "top": 1
         }
 
+        request_id = request_id or current_request_id()
+        headers = {REQUEST_ID_HEADER: request_id} if request_id else None
+
+        data = None
         try:
-            response = requests.post(self.endpoint, headers=headers, json=payload, timeout=20)
-            response.raise_for_status()
-            data = response.json()
+            with span('upstream'):
+                response = self.session.post(self.endpoint, json=payload, timeout=self.timeout, headers=headers)
+                response.raise_for_status()
+                data = response.json()
+        except requests.exceptions.RequestException as e:
+            self.breaker.record_failure()
+            QNA_UPSTREAM_ERRORS.inc(classify_request_error(e))
+            logger.error(f"Error calling Azure QnA (request {request_id}): {e}")
+            return UPSTREAM_ERROR_MESSAGE, 0, None, None
 
-            if data['answers']:
-                answer_data = data['answers'][0]
-                confidence = answer_data.get('confidenceScore', 0)
-                answer_text = answer_data.get('answer', "Maaf, aku belum mengerti pertanyaan itu.")
+        self.breaker.record_success()
+        try:
+            with span('gating'):
+                if data['answers']:
+                    answer_data = data['answers'][0]
+                    confidence = answer_data.get('confidenceScore', 0)
+                    answer_text = answer_data.get('answer', DEFAULT_ANSWER_MESSAGE)
+                    source = {'source': answer_data.get('source'), 'id': answer_data.get('id')}
+                    record_answer('azure', confidence, self.confidence_threshold)
 
-                if confidence >= self.confidence_threshold:
-                    return answer_text, confidence
+                    if confidence >= self.confidence_threshold:
+                        return answer_text, confidence, source, answer_text
+                    else:
+                        return LOW_CONFIDENCE_MESSAGE, confidence, source, answer_text
                 else:
-                    return "Hmm, sepertinya aku belum bisa menjawab pertanyaan itu dengan pasti. Coba tanya yang lain tentang IPA ya!", confidence
-            else:
-                return "Maaf, aku tidak menemukan jawaban yang cocok untuk pertanyaanmu. Yuk, coba tanya tentang pelajaran IPA lainnya!", 0
-        except requests.exceptions.RequestException as e:
-            current_app.logger.error(f"Error calling Azure QnA: {e}")
-            return "Aduh, sepertinya ada sedikit gangguan. Coba tanya lagi nanti ya!", 0
-        except (KeyError, IndexError) as e:
-            current_app.logger.error(f"Error parsing Azure QnA response: {e} - Data: {data}")
-            return "Oops, ada yang aneh dengan jawabannya. Tim teknis sedang diberitahu!", 0
\ No newline at end of file
+                    record_answer('azure', 0, self.confidence_threshold, answered=False)
+                    return NO_ANSWER_MESSAGE, 0, None, None
+        except (KeyError, IndexError, TypeError) as e:
+            QNA_UPSTREAM_ERRORS.inc('parse')
+            logger.error(f"Error parsing Azure QnA response: {e} - Data: {data}")
+            return PARSE_ERROR_MESSAGE, 0, None, None
\ No newline at end of file
@@ -0,0 +1,103 @@
+import contextvars
+import json
+import logging
+import queue
+import threading
+
+from app.metrics import Counter, REGISTRY, current_request_id
+
+logger = logging.getLogger(__name__)
+
+STREAM_DISCONNECTS = REGISTRY.register(Counter(
+    'smardos_stream_disconnects_total',
+    'Stream /ask/stream yang ditinggal klien sebelum selesai (waiting = belum ada token, streaming = di tengah jawaban).',
+    ('phase',)))
+
+_END = object()
+
+
+class Cancellation:
+    """Tanda batal satu stream. Callback (mis. response.close milik request upstream)
+    dipanggil sekali saat cancel(), atau langsung jika didaftarkan setelahnya."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.cancelled = False
+
+    def add_callback(self, callback):
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.debug("Callback pembatalan stream gagal", exc_info=True)
+
+
+def sse_event(event, data):
+    # JSON satu baris: teks jawaban bisa memuat baris baru yang akan memotong field data SSE.
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+def relay(events, heartbeat, cancel):
+    """Teruskan event ('token'/'done', data) sebagai Server-Sent Events.
+
+    events dijalankan di thread (greenlet di worker gevent) terpisah, jadi selama
+    menunggu upstream, misalnya saat model sedang dimuat, tetap ada komentar
+    ': ping' setiap heartbeat detik. Menulis ke koneksi yang sudah ditutup klien
+    membuat server WSGI menutup generator ini; saat itu cancel dipicu sehingga
+    request ke Ollama ikut diputus dan generasinya berhenti.
+    """
+    channel = queue.Queue()
+
+    def produce():
+        try:
+            for item in events:
+                if cancel.cancelled:
+                    break
+                channel.put(item)
+        except Exception:
+            logger.exception(f"Error on /ask/stream (request {current_request_id()})")
+            channel.put(('error', {'error': 'Terjadi kesalahan internal pada server.',
+                                   'request_id': current_request_id()}))
+        finally:
+            events.close()
+            channel.put(_END)
+
+    # Salin context agar request ID, span, dan tier tetap tercatat untuk request ini.
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(produce,), name='ask-stream', daemon=True).start()
+
+    finished = False
+    phase = 'waiting'
+    try:
+        # Kirim header sekarang; klien tahu request diterima walau token pertama masih lama.
+        yield ': ok\n\n'
+        while True:
+            try:
+                item = channel.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': ping\n\n'
+                continue
+            if item is _END:
+                finished = True
+                return
+            event, data = item
+            if event == 'token':
+                phase = 'streaming'
+            yield sse_event(event, data)
+    finally:
+        if not finished:
+            cancel.cancel()
+            STREAM_DISCONNECTS.inc(phase)
@@ -3,8 +3,54 @@ import os
 
 load_dotenv()
 
+basedir = os.path.abspath(os.path.dirname(__file__))
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'fy+j-$5ennuggsgr+9ya2j-ofgq(9_pz(w3sf9oe+n)+rgz_u-'
     AZURE_QNA_ENDPOINT = os.environ.get('AZURE_QNA_ENDPOINT')
     AZURE_QNA_KEY = os.environ.get('AZURE_QNA_KEY')
-    CONFIDENCE_THRESHOLD = float(os.environ.get('CONFIDENCE_THRESHOLD', 0.5))
\ No newline at end of file
+    CONFIDENCE_THRESHOLD = float(os.environ.get('CONFIDENCE_THRESHOLD', 0.5))
+    # 'local' = indeks TF-IDF in-process dari datasets/*.xlsx, 'azure' = Azure QnA
+    QNA_BACKEND = os.environ.get('QNA_BACKEND', 'local')
+    QNA_DATASETS_DIR = os.environ.get('QNA_DATASETS_DIR') or os.path.join(basedir, 'datasets')
+    QNA_INDEX_DIR = os.environ.get('QNA_INDEX_DIR') or os.path.join(basedir, 'instance', 'qna_index')
+    # Detik antar pengecekan perubahan dataset; 0 mematikan hot reload.
+    QNA_INDEX_RELOAD_INTERVAL = float(os.environ.get('QNA_INDEX_RELOAD_INTERVAL', 30))
+    # 0 = worker hanya memuat snapshot CURRENT; pembangunnya master gunicorn (gunicorn.conf.py).
+    QNA_INDEX_BUILD = os.environ.get('QNA_INDEX_BUILD', '1').lower() not in ('0', 'false', 'no')
+    # Koreksi salah ketik ("fotosintsis") untuk pertanyaan yang skornya di bawah ambang.
+    QNA_FUZZY_MATCH = os.environ.get('QNA_FUZZY_MATCH', '1').lower() not in ('0', 'false', 'no')
+    # Koneksi ke Azure QnA (dipakai bersama oleh semua request dalam satu worker)
+    QNA_HTTP_POOL_SIZE = int(os.environ.get('QNA_HTTP_POOL_SIZE', 10))
+    QNA_HTTP_TIMEOUT = float(os.environ.get('QNA_HTTP_TIMEOUT', 20))
+    QNA_HTTP_RETRIES = int(os.environ.get('QNA_HTTP_RETRIES', 2))
+    QNA_HTTP_BACKOFF = float(os.environ.get('QNA_HTTP_BACKOFF', 0.2))
+    QNA_BREAKER_FAILURES = int(os.environ.get('QNA_BREAKER_FAILURES', 5))
+    QNA_BREAKER_RESET = float(os.environ.get('QNA_BREAKER_RESET', 30))
+    # Cache jawaban per pertanyaan ter-normalisasi; ANSWER_CACHE_SIZE=0 mematikan cache.
+    ANSWER_CACHE_SIZE = int(os.environ.get('ANSWER_CACHE_SIZE', 1024))
+    ANSWER_CACHE_TTL = float(os.environ.get('ANSWER_CACHE_TTL', 600))
+    # Router /ask bertingkat: sapaan (lookup persis) -> dataset -> LLM untuk confidence di bawah ambang.
+    CHITCHAT_DATASET = os.environ.get('CHITCHAT_DATASET', 'ipas_chitchat_edupintar.xlsx')
+    # Base URL API Ollama, mis. http://localhost:11434; kosong = tier LLM dimatikan.
+    LLM_BACKEND_URL = os.environ.get('LLM_BACKEND_URL')
+    LLM_MODEL = os.environ.get('LLM_MODEL', 'llama3')
+    LLM_MAX_TOKENS = int(os.environ.get('LLM_MAX_TOKENS', 256))
+    # Batas waktu total satu /ask (detik); LLM hanya mendapat sisa waktunya.
+    ANSWER_LATENCY_BUDGET = float(os.environ.get('ANSWER_LATENCY_BUDGET', 8))
+    # Jika LLM gagal, jawaban dataset terbaik tetap dipakai selama confidence-nya >= nilai ini.
+    LLM_FALLBACK_MIN_CONFIDENCE = float(os.environ.get('LLM_FALLBACK_MIN_CONFIDENCE', 0.3))
+    # Jumlah maksimum pertanyaan per request /ask/batch
+    ASK_BATCH_MAX = int(os.environ.get('ASK_BATCH_MAX', 500))
+    # Span per tahap + rute /metrics (format teks Prometheus); METRICS_ENABLED=0 mematikannya.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+    METRICS_PATH = os.environ.get('METRICS_PATH', '/metrics')
+    # Batas request /ask yang diproses bersamaan per worker; sisanya langsung 503 + Retry-After.
+    MAX_INFLIGHT_REQUESTS = int(os.environ.get('MAX_INFLIGHT_REQUESTS', 200))
+    # Detik menunggu slot kosong sebelum menolak (0 = langsung tolak).
+    INFLIGHT_ACQUIRE_TIMEOUT = float(os.environ.get('INFLIGHT_ACQUIRE_TIMEOUT', 0))
+    BUSY_RETRY_AFTER = int(os.environ.get('BUSY_RETRY_AFTER', 2))
+    LIMITED_ENDPOINTS = ('main.ask', 'main.ask_batch', 'main.ask_stream')
+    # Detik antar komentar heartbeat /ask/stream selama menunggu token; sekaligus batas
+    # waktu mendeteksi klien yang sudah menutup koneksi.
+    STREAM_HEARTBEAT_SECONDS = float(os.environ.get('STREAM_HEARTBEAT_SECONDS', 5))
\ No newline at end of file
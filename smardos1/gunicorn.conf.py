@@ -0,0 +1,42 @@
+"""Konfigurasi produksi: gunicorn + worker gevent.
+
+Di worker gevent, socket di-monkeypatch sehingga panggilan `requests` ke Azure QnA
+atau LLM tidak memblokir worker; satu proses bisa menahan ratusan request yang
+sedang menunggu upstream. Batas per worker diatur MAX_INFLIGHT_REQUESTS di config.py.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+# gevent: satu proses per core sudah cukup karena menunggu I/O tidak memakan worker.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# Koneksi terbuka maksimum per worker gevent; harus di atas MAX_INFLIGHT_REQUESTS
+# agar kelebihan beban dijawab 503 oleh aplikasi, bukan tertahan di backlog socket.
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+# GUNICORN_ACCESS_LOG= (kosong) mematikan access log.
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    """Master membangun snapshot indeks QnA sekali, lalu mengawasi dataset sendiri.
+
+    Worker (di-fork setelah ini) mewarisi QNA_INDEX_BUILD=0 sehingga hanya memuat
+    CURRENT yang baru; parsing Excel + fit TF-IDF tidak pernah berjalan di event loop
+    worker gevent dan tidak diulang di setiap worker.
+    """
+    os.environ['QNA_INDEX_BUILD'] = '0'
+    from config import Config
+    if Config.QNA_BACKEND != 'local':
+        return
+    from app.services.index_snapshot import SnapshotBuilder
+    SnapshotBuilder(
+        Config.QNA_DATASETS_DIR,
+        Config.QNA_INDEX_DIR,
+        reload_interval=Config.QNA_INDEX_RELOAD_INTERVAL,
+    ).start()
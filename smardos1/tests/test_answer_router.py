@@ -0,0 +1,72 @@
+from app.services.answer_router import AnswerRouter, TIER_FALLBACK, TIER_LLM
+from app.services.llm_service import LLMStreamInterrupted
+
+
+class FakeRetrieval:
+    def __init__(self, confidence=0.4, delay=0.0, clock=None):
+        self.confidence = confidence
+        self.delay = delay
+        self.clock = clock
+
+    def match(self, question_text):
+        if self.clock is not None:
+            self.clock.now += self.delay
+        return 'tidak tahu', self.confidence, {'tier': 'retrieval'}, 'jawaban dataset'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeLLM:
+    model = 'fake'
+
+    def __init__(self, tokens=(), fail_after=None):
+        self.tokens = tokens
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def stream(self, question, timeout, hint=None, cancel=None):
+        self.calls += 1
+        for i, token in enumerate(self.tokens):
+            if i == self.fail_after:
+                raise LLMStreamInterrupted('putus')
+            yield token
+
+
+def test_stream_answer_falls_back_when_budget_is_used_up():
+    clock = FakeClock()
+    llm = FakeLLM(tokens=['tidak', 'dipakai'])
+    router = AnswerRouter(FakeRetrieval(delay=0.2, clock=clock), 0.5, llm=llm, latency_budget=0.1, clock=clock)
+
+    events = list(router.stream_answer('pertanyaan'))
+
+    assert llm.calls == 0
+    assert events[0] == ('token', 'jawaban dataset')
+    assert events[-1][0] == 'done'
+    assert events[-1][1]['tier'] == TIER_FALLBACK
+    assert events[-1][1]['answer'] == 'jawaban dataset'
+
+
+def test_stream_answer_streams_llm_tokens():
+    router = AnswerRouter(FakeRetrieval(), 0.5, llm=FakeLLM(tokens=['Halo ', 'dunia']))
+
+    events = list(router.stream_answer('pertanyaan'))
+
+    assert events[:2] == [('token', 'Halo '), ('token', 'dunia')]
+    assert events[-1][1]['tier'] == TIER_LLM
+    assert events[-1][1]['answer'] == 'Halo dunia'
+
+
+def test_stream_answer_replaces_interrupted_llm_answer():
+    router = AnswerRouter(FakeRetrieval(), 0.5, llm=FakeLLM(tokens=['Halo ', 'dunia'], fail_after=1))
+
+    events = list(router.stream_answer('pertanyaan'))
+
+    assert events[:-1] == [('token', 'Halo ')]
+    assert events[-1][1]['tier'] == TIER_FALLBACK
+    assert events[-1][1]['answer'] == 'jawaban dataset'
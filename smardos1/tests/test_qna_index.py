@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+pytest.importorskip('sklearn')
+pytest.importorskip('openpyxl')
+
+from app.services.index_snapshot import build_snapshot, load_snapshot
+from app.services.qna_index import QnAIndex, question_terms
+
+DATASETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'datasets')
+
+OUT_OF_DATASET = [
+    'Apa yang dimaksud dengan demokrasi?',
+    'Apa yang dimaksud dengan ekosistem?',
+    'Apa yang dimaksud dengan fotosintesis?',
+    'Apa itu inflasi?',
+]
+
+PARAPHRASES = [
+    ('apa yang dimaksud sendi', 'Apa yang dimaksud dengan sendi?'),
+    ('jelaskan apa itu sendi', 'Apa yang dimaksud dengan sendi?'),
+    ('tolong jelaskan apa yang dimaksud dengan sendi dong', 'Apa yang dimaksud dengan sendi?'),
+]
+
+
+@pytest.fixture(scope='module')
+def built_index():
+    return QnAIndex.from_datasets(DATASETS_DIR)
+
+
+@pytest.fixture(scope='module')
+def snapshot_index(tmp_path_factory):
+    snapshot_dir = str(tmp_path_factory.mktemp('snapshot'))
+    return load_snapshot(snapshot_dir, build_snapshot(DATASETS_DIR, snapshot_dir))
+
+
+def test_question_terms_strips_question_template():
+    assert question_terms('Apa yang dimaksud dengan sendi?') == 'sendi'
+    # Pertanyaan yang seluruhnya kerangka tetap punya teks untuk dicocokkan.
+    assert question_terms('Kamu siapa?') == 'siapa'
+    assert question_terms('Apa itu?') == 'Apa itu?'
+
+
+@pytest.mark.parametrize('index_name', ['built_index', 'snapshot_index'])
+def test_out_of_dataset_questions_score_below_threshold(index_name, request):
+    index = request.getfixturevalue(index_name)
+    _, scores = index.search_many(OUT_OF_DATASET, fuzzy_below=0.5)
+    assert all(score < 0.5 for score in scores), dict(zip(OUT_OF_DATASET, scores))
+
+
+@pytest.mark.parametrize('index_name', ['built_index', 'snapshot_index'])
+def test_paraphrases_of_dataset_questions_still_match(index_name, request):
+    index = request.getfixturevalue(index_name)
+    best, scores = index.search_many([paraphrase for paraphrase, _ in PARAPHRASES], fuzzy_below=0.5)
+    questions = list(index.questions)
+    for (paraphrase, expected), position, score in zip(PARAPHRASES, best, scores):
+        assert index.answer_at(position) == index.answer_at(questions.index(expected)), paraphrase
+        assert score >= 0.5, paraphrase
@@ -1,8 +1,20 @@
-import os
+import re
+import time
+import uuid
 import streamlit as st
 import requests 
-import PyPDF2
-from streamlit_mic_recorder import mic_recorder
+
+# PyPDF2, langchain, dan widget suara sengaja tidak diimpor di sini: dimuat saat pertama dipakai
+# agar tampilan pertama tidak menunggu import berat (cek: python -m benchmarks.importtime).
+from services.chat_history import HISTORY_PAGE_SIZE, ChatHistory
+from services.documents import estimate_tokens, ingest_uploaded_file
+from services.conversation import ConversationMemory, ollama_summarizer
+from services.conversation_store import PersistentChatHistory, get_conversation_store
+from services.generation import stream_smardos_response
+from services.ollama_client import COLD, FAILED, WARM, WARMING, get_warmup_tracker
+from services.ollama_pool import OLLAMA_HOSTS, get_ollama_pool
+from services.scheduler import get_scheduler
+from services.semantic_cache import get_semantic_cache
 
 # ======================================================
 # 1. KONFIGURASI HALAMAN
@@ -118,72 +130,188 @@ st.markdown(
 # ======================================================
 # 3. KONFIG OLLAMA
 # ======================================================
-OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://host.docker.internal:11434").rstrip("/")
+# Host diatur lewat OLLAMA_HOSTS (dipisah koma) atau OLLAMA_BASE_URL; lihat services/ollama_pool.py
+OLLAMA_POOL = get_ollama_pool()
 
 # ======================================================
 # 4. LOGIC FUNCTIONS
 # ======================================================
-@st.cache_data(ttl=300)
-def get_available_models(base_url: str):
-    """GET {base_url}/api/tags"""
+def get_available_models():
+    """Model dari inventaris terakhir poller; tidak menunggu jaringan."""
+    return OLLAMA_POOL.models()
+
+
+def render_voice_input():
+    """Tombol rekam suara; streamlit_mic_recorder baru diimpor saat bar input pertama kali tampil."""
     try:
-        r = requests.get(f"{base_url}/api/tags", timeout=5)
-        r.raise_for_status()
-        data = r.json()
-        return [m["name"] for m in data.get("models", [])]
-    except Exception:
-        return []
-
-import io
-try:
-    from PyPDF2 import PdfReader
-    # Tambahkan speech_to_text di sini
-    from streamlit_mic_recorder import mic_recorder, speech_to_text
-except ImportError:
-    st.error("Mohon install library tambahan: pip install PyPDF2 streamlit-mic-recorder")
-
-def extract_text_from_file(uploaded_file):
-    """Ekstraksi teks dari berbagai format dokumen."""
-    text = ""
+        from streamlit_mic_recorder import speech_to_text
+    except ImportError:
+        st.error("Mohon install library tambahan: pip install streamlit-mic-recorder")
+        return None
+    # Gunakan key unik dan tangkap outputnya
+    return speech_to_text(
+        language='id', 
+        start_prompt="🎤", 
+        stop_prompt="🛑", 
+        key='speech_input_widget', # Key harus spesifik
+        use_container_width=False
+    )
+
+
+def render_streamed_response(placeholder, chunks, stats: dict = None) -> str:
+    """Tampilkan token ke placeholder secara bertahap dan kembalikan jawaban lengkap.
+
+    Error di tengah stream tidak membuang teks yang sudah diterima. Jika skrip
+    dihentikan Streamlit (tombol Stop / rerun), generator ditutup sehingga koneksi
+    ke Ollama ikut diputus, dan jawaban parsial tetap disimpan ke riwayat.
+    Waktu token pertama (TTFT) dan total dicatat ke stats.
+    """
+    stats = stats if stats is not None else {}
+    started = time.perf_counter()
+    parts = []
+    completed = False
     try:
-        if uploaded_file.type == "application/pdf":
-            pdf_reader = PdfReader(uploaded_file)
-            for page in pdf_reader.pages:
-                text += page.extract_text()
-        elif uploaded_file.type == "text/plain":
-            text = uploaded_file.read().decode("utf-8")
+        for chunk in chunks:
+            if not parts:
+                stats["ttft"] = time.perf_counter() - started
+            parts.append(chunk)
+            placeholder.markdown("".join(parts) + "▌")
+        completed = True
     except Exception as e:
-        st.error(f"Gagal membaca file: {e}")
-    return text
+        parts.append(f"\n\n⚠️ _Jawaban terputus karena gangguan koneksi ke Ollama: {e}_")
+        completed = True
+    finally:
+        chunks.close()
+        stats["total"] = time.perf_counter() - started
+        if not completed:
+            parts.append("\n\n_(jawaban dihentikan)_")
+        response = "".join(parts) or "Maaf, SMARDOS tidak menghasilkan jawaban. Coba ulangi pertanyaannya."
+        st.session_state.messages.append({"role": "assistant", "content": response, "metrics": dict(stats)})
+
+    placeholder.markdown(response)
+    return response
+
+
+def format_turn_metrics(metrics: dict) -> str:
+    parts = []
+    if metrics.get("queue_wait") and metrics["queue_wait"] >= 0.1:
+        parts.append(f"antre {metrics['queue_wait']:.1f} dtk")
+    if metrics.get("ttft") is not None:
+        parts.append(f"token pertama {metrics['ttft']:.2f} dtk")
+    if metrics.get("total") is not None:
+        parts.append(f"total {metrics['total']:.1f} dtk")
+    if metrics.get("generation_time") is not None:
+        parts.append(f"generasi {metrics['generation_time']:.1f} dtk")
+    if metrics.get("prompt_tokens"):
+        parts.append(f"prompt {metrics['prompt_tokens']} token")
+    if metrics.get("cache_similarity") is not None:
+        parts.append(f"dari cache semantik (kemiripan {metrics['cache_similarity']:.2f})")
+    if metrics.get("coalesced"):
+        parts.append("berbagi generasi dengan pertanyaan identik")
+    return "⏱️ " + " · ".join(parts) if parts else ""
+
+
+WELCOME_MESSAGE = {
+    "role": "assistant",
+    "content": (
+        "Halo, saya **SMARDOS**. "
+        "Silakan pilih model AI di sidebar dan mulai berdiskusi."
+    ),
+}
+
+
+def open_chat_history() -> ChatHistory:
+    """Riwayat percakapan ?sesi=... dari SQLite, jadi tetap ada setelah halaman di-refresh.
+
+    Jika database tidak bisa dibuka, riwayat hanya disimpan di memori sesi.
+    """
+    store = get_conversation_store()
+    if store is None:
+        return ChatHistory()
+    conversation_id = st.query_params.get("sesi", "")
+    if not re.fullmatch(r"[0-9a-f]{32}", conversation_id):
+        conversation_id = uuid.uuid4().hex
+        st.query_params["sesi"] = conversation_id
+    return PersistentChatHistory(store, conversation_id)
 
-def generate_smardos_response(user_input: str, model_name: str, base_url: str) -> str:
-    """Generate response via langchain_ollama to Ollama HTTP endpoint."""
-    try:
-        from langchain_ollama import OllamaLLM
-    except ModuleNotFoundError:
-        return "Ollama (langchain_ollama) tidak tersedia di environment ini."
-
-    llm = OllamaLLM(
-        model=model_name,
-        temperature=0.3,
-        base_url=base_url,
-        num_predict=350,  # biar lebih cepat & nggak kepanjangan
-    )
 
-    system_instructions = (
-        "Kamu adalah SMARDOS (Smart Asisten Dosen), asisten akademik khusus perguruan tinggi.\n"
-        "TUGAS UTAMA:\n"
-        "1. Hanya jawab pertanyaan yang berkaitan dengan materi perkuliahan, teori akademik, atau metode penelitian.\n"
-        "2. Jika pertanyaan TIDAK berkaitan dengan perkuliahan/pendidikan, tolak dengan sopan.\n"
-        "3. Setiap jawaban WAJIB menyertakan referensi ilmiah di bagian akhir.\n"
-        "4. Format referensi harus mencantumkan Link URL (Google Scholar/DOAJ/portal jurnal).\n"
-        "5. Gunakan Bahasa Indonesia yang formal dan edukatif.\n"
-        "6. Jawaban maksimal 6 paragraf, ringkas dan jelas.\n"
-        "7. Jika memberikan kode/sintaks, WAJIB gunakan blok ```bahasa ... ``` agar rapi."
-    )
+def render_message(message: dict):
+    avatar = "🎓" if message["role"] == "assistant" else "👤"
+    with st.chat_message(message["role"], avatar=avatar):
+        st.markdown(message["content"])
+        if message.get("metrics"):
+            st.caption(format_turn_metrics(message["metrics"]))
+
+
+def show_earlier_messages():
+    st.session_state.history_visible += HISTORY_PAGE_SIZE
+
+
+def render_history(history: ChatHistory):
+    """Tampilkan hanya jendela pesan terakhir; pesan lebih lama dimuat per halaman.
+
+    Biaya satu rerun sebanding dengan ukuran jendela, bukan panjang percakapan.
+    """
+    if not len(history):
+        render_message(WELCOME_MESSAGE)
+    start = max(0, len(history) - st.session_state.history_visible)
+    if start:
+        st.button(
+            f"⬆️ Muat pesan sebelumnya ({start} tersembunyi)",
+            key="load_earlier_history",
+            on_click=show_earlier_messages,
+        )
+    for message in history[start:]:
+        render_message(message)
 
-    full_prompt = f"### Instruction:\n{system_instructions}\n\n### User Question:\n{user_input}\n\n### Response:"
-    return llm.invoke(full_prompt)
+
+@st.fragment(run_every=1)
+def wait_for_inventory():
+    """Tampil selama belum ada model; rerun halaman begitu poller menemukan model."""
+    if OLLAMA_POOL.models():
+        st.rerun()
+    if not OLLAMA_POOL.rounds:
+        st.caption("⏳ Menghubungi host Ollama...")
+    elif any(h["healthy"] for h in OLLAMA_POOL.snapshot()):
+        st.warning("Ollama terhubung, tapi belum ada model. Jalankan `ollama pull ...` di host dulu.")
+    else:
+        st.error("Tidak ada host Ollama yang bisa dihubungi.")
+
+
+@st.fragment(run_every=2)
+def render_model_status(model_name: str):
+    """Indikator warm/cold model; diperbarui sendiri tanpa rerun seluruh halaman."""
+    hosts = OLLAMA_POOL.snapshot()
+    healthy = [h for h in hosts if h["healthy"] and model_name in h["models"]]
+    if len(hosts) > 1:
+        st.caption(f"🖥️ {len(healthy)}/{len(hosts)} host sehat memiliki model ini")
+    base_url = OLLAMA_POOL.pick(model_name)
+    if base_url is None:
+        st.caption("🔴 Tidak ada host sehat yang memiliki model ini")
+        return
+    tracker = get_warmup_tracker()
+    tracker.refresh_from_server(model_name, base_url)
+    state = tracker.state(model_name, base_url)
+    status = state["status"]
+    if status == WARM:
+        detail = f" (dimuat dalam {state['load_seconds']:.1f} dtk)" if "load_seconds" in state else ""
+        st.caption(f"🟢 Model siap di memori{detail}")
+    elif status == WARMING:
+        st.caption(f"🟡 Memuat model ke memori... {time.time() - state['at']:.0f} dtk")
+    elif status == FAILED:
+        st.caption(f"🔴 Gagal memuat model: {state.get('error', '-')}")
+    elif status == COLD:
+        st.caption("⚪ Model belum dimuat")
+
+    load = get_scheduler().snapshot()
+    queued = load["queued"].get(model_name, 0)
+    running = load["running"].get(model_name, 0)
+    if queued or running:
+        st.caption(f"🧮 {running} sedang diproses · {queued} antre")
+
+    cache = get_semantic_cache().stats()
+    if cache["hits"] or cache["misses"]:
+        st.caption(f"♻️ Cache semantik: {cache['hit_rate']:.0%} hit dari {cache['hits'] + cache['misses']} pertanyaan")
 
 
 def check_ollama_connection(base_url: str):
@@ -207,24 +335,34 @@ with st.sidebar:
     st.caption("v2.5 - Your Smart Academic Partner")
 
     st.subheader("⚙️ Panel Kontrol AI")
-    st.caption(f"🔗 Ollama Base URL: `{OLLAMA_BASE_URL}`")
+    for url in OLLAMA_HOSTS:
+        st.caption(f"🔗 Ollama Base URL: `{url}`")
 
-    available_models = get_available_models(OLLAMA_BASE_URL)
+    available_models = get_available_models()
 
     if available_models:
         selected_model = st.selectbox("Pilih Model Ollama", available_models)
         st.success(f"Model aktif: **{selected_model}**")
+        # Muat bobot model di background begitu dipilih, sebelum prompt pertama dikirim
+        warm_host = OLLAMA_POOL.pick(selected_model)
+        if warm_host:
+            get_warmup_tracker().ensure_warm(selected_model, warm_host)
+        render_model_status(selected_model)
     else:
         selected_model = None
-        st.warning("Ollama terhubung, tapi belum ada model. Jalankan `ollama pull ...` di host dulu.")
+        wait_for_inventory()
 
     if st.button("🔍 Cek Koneksi Ollama"):
-        check_ollama_connection(OLLAMA_BASE_URL)
+        OLLAMA_POOL.refresh()
+        for url in OLLAMA_HOSTS:
+            check_ollama_connection(url)
 
     st.markdown("---")
 
     if st.button("🗑️ Bersihkan Riwayat Chat"):
-        st.session_state.messages = []
+        st.session_state.messages.clear()
+        st.session_state.history_visible = HISTORY_PAGE_SIZE
+        st.session_state.conversation = ConversationMemory()
         st.rerun()
 
 # ======================================================
@@ -253,94 +391,138 @@ if "last_voice_text" not in st.session_state:
     st.session_state.last_voice_text = ""
 
 if "messages" not in st.session_state:
-    st.session_state.messages = [
-        {
-            "role": "assistant",
-            "content": (
-                "Halo, saya **SMARDOS**. "
-                "Silakan pilih model AI di sidebar dan mulai berdiskusi."
-            )
-        }
-    ]
+    st.session_state.messages = open_chat_history()
+
+if "history_visible" not in st.session_state:
+    st.session_state.history_visible = HISTORY_PAGE_SIZE
+
+if "conversation" not in st.session_state:
+    # Percakapan yang dibuka ulang: hanya giliran yang sudah dimuat yang ikut diringkas.
+    st.session_state.conversation = ConversationMemory(
+        summarized_upto=len(st.session_state.messages) - st.session_state.messages.in_memory
+    )
 
-for message in st.session_state.messages:
-    avatar = "🎓" if message["role"] == "assistant" else "👤"
-    with st.chat_message(message["role"], avatar=avatar):
-        st.markdown(message["content"])
 
-if selected_model:
-    # Container tetap di bawah menggunakan CSS class
-    st.markdown('<div class="input-container-fixed">', unsafe_allow_html=True)
+@st.fragment
+def chat_area(selected_model):
+    """Riwayat + input chat sebagai fragment: kirim pesan atau muat halaman lama hanya
+    menjalankan ulang bagian ini, bukan sidebar dan seluruh halaman."""
+    render_history(st.session_state.messages)
+
+    if selected_model:
+        # Giliran baru dirender di sini, jadi tidak perlu rerun agar urutannya benar
+        exchange = st.container()
+
+        # Container tetap di bawah menggunakan CSS class
+        st.markdown('<div class="input-container-fixed">', unsafe_allow_html=True)
     
-    col_upload, col_input, col_voice = st.columns([0.07, 0.86, 0.07])
+        col_upload, col_input, col_voice = st.columns([0.07, 0.86, 0.07])
     
-    with col_upload:
-        uploaded_file = st.file_uploader("📎", type=['pdf', 'txt'], label_visibility="collapsed", key="doc_upload")
-
-    with col_voice:
-        # Gunakan key unik dan tangkap outputnya
-        text_from_voice = speech_to_text(
-            language='id', 
-            start_prompt="🎤", 
-            stop_prompt="🛑", 
-            key='speech_input_widget', # Key harus spesifik
-            use_container_width=False
-        )
+        with col_upload:
+            uploaded_file = st.file_uploader("📎", type=['pdf', 'txt'], label_visibility="collapsed", key="doc_upload")
 
-    with col_input:
-        prompt = st.chat_input("Tanyakan sesuatu pada SMARDOS...", key="chat_input_widget")
+        with col_voice:
+            text_from_voice = render_voice_input()
+
+        with col_input:
+            prompt = st.chat_input("Tanyakan sesuatu pada SMARDOS...", key="chat_input_widget")
         
-    st.markdown('</div>', unsafe_allow_html=True)
-
-    # --- LOGIKA PENGIRIMAN PESAN (Satu Gerbang) ---
-    # Inisialisasi variabel penampung agar tidak dobel
-    final_user_msg = None
-
-    # Cek mana yang memberikan input
-    if prompt:
-        final_user_msg = prompt
-    elif (
-        text_from_voice
-        and not st.session_state.voice_consumed
-        and text_from_voice != st.session_state.last_voice_text
-        ):
-        final_user_msg = text_from_voice
-        st.session_state.voice_consumed = True
-        st.session_state.last_voice_text = text_from_voice
-
-    # Eksekusi hanya jika ada pesan baru yang valid
-    if final_user_msg:
-        final_context = ""
-        if uploaded_file:
-            with st.status("Menganalisis dokumen...", expanded=False):
-                file_content = extract_text_from_file(uploaded_file)
-                final_context = f"\n<CONTEXT_DOKUMEN>\n{file_content}\n</CONTEXT_DOKUMEN>\n"
-
-        full_prompt_to_ai = f"{final_context} Pertanyaan User: {final_user_msg}"
-
-        # Simpan ke history
-        st.session_state.messages.append({"role": "user", "content": final_user_msg})
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        # --- LOGIKA PENGIRIMAN PESAN (Satu Gerbang) ---
+        # Inisialisasi variabel penampung agar tidak dobel
+        final_user_msg = None
+
+        # Cek mana yang memberikan input
+        if prompt:
+            final_user_msg = prompt
+        elif (
+            text_from_voice
+            and not st.session_state.voice_consumed
+            and text_from_voice != st.session_state.last_voice_text
+            ):
+            final_user_msg = text_from_voice
+            st.session_state.voice_consumed = True
+            st.session_state.last_voice_text = text_from_voice
+
+        # Eksekusi hanya jika ada pesan baru yang valid
+        if final_user_msg:
+            final_context = ""
+            if uploaded_file:
+                with st.status("Menganalisis dokumen...", expanded=False) as doc_status:
+                    try:
+                        # Ekstraksi + indeks di-cache per hash isi berkas; hanya potongan relevan yang dikirim
+                        document = ingest_uploaded_file(
+                            uploaded_file,
+                            progress=lambda done, total: doc_status.update(
+                                label=f"Menganalisis dokumen... halaman {done}/{total}"
+                            ),
+                        )
+                        file_content = document.context_for(final_user_msg)
+                    except Exception as e:
+                        document, file_content = None, ""
+                        st.error(f"Gagal membaca file: {e}")
+                    if document is not None and document.is_empty:
+                        st.warning("Dokumen tidak berisi teks yang bisa dibaca (mungkin hasil scan).")
+                    if document is not None and document.info.get("truncated"):
+                        st.warning(
+                            f"Dokumen terlalu besar; hanya {document.info.get('pages_read', 'sebagian')} "
+                            f"halaman pertama yang dianalisis."
+                        )
+                    if file_content:
+                        doc_status.update(label=f"Dokumen dianalisis: {len(document.chunks)} bagian, ~{estimate_tokens(file_content)} token dipakai")
+                        final_context = f"\n<CONTEXT_DOKUMEN>\n{file_content}\n</CONTEXT_DOKUMEN>\n"
+
+            full_prompt_to_ai = f"{final_context} Pertanyaan User: {final_user_msg}"
+
+            # Konteks multi-giliran: ringkasan bergulir + beberapa giliran terakhir (dibatasi token)
+            conversation = st.session_state.conversation
+            summary, recent_history = conversation.context(st.session_state.messages)
+
+            # Simpan ke history
+            st.session_state.messages.append({"role": "user", "content": final_user_msg})
         
-        # Tampilkan di UI segera
-        with st.chat_message("user", avatar="👤"):
-            st.markdown(final_user_msg)
-            if uploaded_file: st.caption(f"📁 Terlampir: {uploaded_file.name}")
-
-        # Respon AI
-        with st.chat_message("assistant", avatar="🎓"):
-            placeholder = st.empty()
-            placeholder.markdown("🔍 **SMARDOS sedang menyusun jawaban akademik...**")
-            
-            response = generate_smardos_response(full_prompt_to_ai, selected_model, OLLAMA_BASE_URL)
+            # Tampilkan di UI segera, tepat di bawah riwayat (di atas bar input)
+            with exchange, st.chat_message("user", avatar="👤"):
+                st.markdown(final_user_msg)
+                if uploaded_file: st.caption(f"📁 Terlampir: {uploaded_file.name}")
+
+            # Respon AI
+            with exchange, st.chat_message("assistant", avatar="🎓"):
+                placeholder = st.empty()
+                placeholder.markdown("🔍 **SMARDOS sedang menyusun jawaban akademik...**")
             
-            placeholder.markdown(response)
-            st.session_state.messages.append({"role": "assistant", "content": response})
-        
-        # PENTING: Paksa rerun agar widget voice ter-reset dan tidak mengirim teks yang sama lagi
-        st.session_state.voice_consumed = False
-        st.rerun()       
-else:
-    st.info("Pilih model di sidebar untuk memulai.")
+                # Token ditampilkan begitu dihasilkan; riwayat diisi oleh render_streamed_response
+                turn_stats = {}
+                render_streamed_response(
+                    placeholder,
+                    stream_smardos_response(
+                        full_prompt_to_ai,
+                        selected_model,
+                        summary=summary,
+                        history=recent_history,
+                        stats=turn_stats,
+                        on_queue=lambda position: placeholder.markdown(
+                            f"⏳ **Server SMARDOS sedang sibuk.** Pertanyaanmu ada di antrean ke-{position}..."
+                        ) if position else None,
+                    ),
+                    stats=turn_stats,
+                )
+
+            # Giliran lama dilipat ke ringkasan di background, tidak menunda giliran berikutnya
+            conversation.schedule_update(
+                st.session_state.messages,
+                ollama_summarizer(selected_model),
+            )
+
+            # Tanpa st.rerun(): giliran baru sudah tampil di tempatnya. Teks suara yang sama
+            # tidak terkirim ulang karena dibandingkan dengan last_voice_text.
+            st.session_state.voice_consumed = False
+    else:
+        st.info("Pilih model di sidebar untuk memulai.")
+
+
+chat_area(selected_model)
 
 st.markdown(
     "<div style='text-align:center;color:#94a3b8;font-size:12px;margin-top:50px;'>"
@@ -0,0 +1 @@
+"""Komponen backend SMARDOS yang dipakai bersama oleh halaman Streamlit."""
@@ -0,0 +1,99 @@
+import json
+import os
+import zlib
+
+# Jumlah pesan terbaru yang disimpan utuh di session state; sisanya dipadatkan.
+HISTORY_MEMORY_MESSAGES = int(os.getenv("HISTORY_MEMORY_MESSAGES", "60"))
+# Jumlah pesan per blok terkompresi, sekaligus ukuran satu halaman "muat pesan sebelumnya".
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+
+
+class CompressedStore:
+    """Arsip pesan lama: blok JSON terkompresi zlib, urut dari yang tertua.
+
+    Teks percakapan mengecil sekitar 3-5x, dan dict/str Python per pesan tidak
+    lagi hidup di memori sampai halamannya benar-benar diminta.
+    """
+
+    def __init__(self):
+        self._blocks = []  # (indeks_awal, jumlah, blob)
+        self.count = 0
+
+    def append_block(self, messages: list):
+        blob = zlib.compress(json.dumps(messages, ensure_ascii=False).encode("utf-8"), 6)
+        self._blocks.append((self.count, len(messages), blob))
+        self.count += len(messages)
+
+    def read(self, start: int, stop: int) -> list:
+        """Pesan dengan indeks absolut [start, stop); hanya blok yang beririsan yang didekompresi."""
+        messages = []
+        for block_start, count, blob in self._blocks:
+            if block_start + count <= start or block_start >= stop:
+                continue
+            block = json.loads(zlib.decompress(blob).decode("utf-8"))
+            messages.extend(block[max(0, start - block_start):stop - block_start])
+        return messages
+
+    @property
+    def compressed_bytes(self) -> int:
+        return sum(len(blob) for _, _, blob in self._blocks)
+
+
+class ChatHistory:
+    """Riwayat chat satu sesi dengan batas jumlah pesan di memori.
+
+    Begitu lebih dari memory_limit pesan tersimpan, page_size pesan tertua dipindah
+    ke store terkompresi. Indeks dan slice tetap memakai posisi absolut, jadi
+    ConversationMemory dan halaman chat tidak perlu tahu pesan mana yang sudah
+    dipadatkan; hanya pembacaan ke bagian lama yang membayar biaya dekompresi.
+    """
+
+    def __init__(self, messages=(), memory_limit: int = HISTORY_MEMORY_MESSAGES,
+                 page_size: int = HISTORY_PAGE_SIZE, store=None):
+        self.page_size = max(1, page_size)
+        self.memory_limit = max(memory_limit, self.page_size)
+        self.store = store if store is not None else CompressedStore()
+        self._recent = []
+        # Indeks absolut milik self._recent[0].
+        self._offset = 0
+        for message in messages:
+            self.append(message)
+
+    def __len__(self) -> int:
+        return self._offset + len(self._recent)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            messages = self.window(start, stop) if start < stop else []
+            return messages[::step] if step != 1 else messages
+        index = key + len(self) if key < 0 else key
+        if not 0 <= index < len(self):
+            raise IndexError("indeks riwayat chat di luar jangkauan")
+        return self.window(index, index + 1)[0]
+
+    def append(self, message: dict):
+        self._recent.append(message)
+        if len(self._recent) > self.memory_limit:
+            spilled = self._recent[:self.page_size]
+            del self._recent[:self.page_size]
+            self.store.append_block(spilled)
+            self._offset += len(spilled)
+
+    def clear(self):
+        self.store = CompressedStore()
+        self._recent = []
+        self._offset = 0
+
+    def window(self, start: int, stop: int) -> list:
+        """Pesan [start, stop) dari memori, ditambah dari store jika start sudah dipadatkan."""
+        start, stop = max(0, start), min(stop, len(self))
+        older = self.store.read(start, min(stop, self._offset)) if start < self._offset else []
+        return older + self._recent[max(0, start - self._offset):max(0, stop - self._offset)]
+
+    @property
+    def in_memory(self) -> int:
+        return len(self._recent)
@@ -0,0 +1,124 @@
+import os
+import threading
+
+from services.documents import estimate_tokens
+
+# Anggaran token untuk ringkasan + riwayat yang ikut dikirim di setiap prompt.
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+# Jumlah pasangan tanya-jawab terakhir yang dikirim apa adanya.
+RECENT_TURNS = int(os.getenv("RECENT_TURNS", "3"))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "300"))
+
+SUMMARY_INSTRUCTIONS = (
+    "Ringkas percakapan konsultasi akademik berikut dalam Bahasa Indonesia, maksimal 6 kalimat. "
+    "Pertahankan topik, istilah penting, dan pertanyaan yang belum terjawab. "
+    "Jangan menambahkan informasi baru."
+)
+
+
+def _compress_turn(message: dict, max_words: int = 40) -> str:
+    words = message["content"].split()
+    text = " ".join(words[:max_words]) + (" ..." if len(words) > max_words else "")
+    speaker = "Mahasiswa" if message["role"] == "user" else "SMARDOS"
+    return f"{speaker}: {text}"
+
+
+def extractive_summary(previous_summary: str, messages: list) -> str:
+    """Cadangan tanpa LLM: potong tiap giliran lama lalu buang baris tertua jika melebihi batas."""
+    lines = previous_summary.splitlines() if previous_summary else []
+    lines.extend(_compress_turn(m) for m in messages)
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > SUMMARY_MAX_TOKENS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def ollama_summarizer(model_name: str):
+    """Peringkas berbasis model yang sama, dengan batas token keluaran kecil.
+
+    Ringkasan lewat scheduler bersama dengan prioritas latar dan host dari pool,
+    jadi tidak berebut slot dengan pertanyaan user berikutnya.
+    """
+    from services.generation import background_completion
+
+    complete = background_completion(model_name, num_predict=SUMMARY_MAX_TOKENS)
+
+    def summarize(previous_summary: str, messages: list) -> str:
+        transcript = "\n".join(_compress_turn(m, max_words=150) for m in messages)
+        result = complete([
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": f"Ringkasan sebelumnya:\n{previous_summary or '-'}\n\nPercakapan lanjutan:\n{transcript}"},
+        ])
+        return result.strip() or extractive_summary(previous_summary, messages)
+
+    return summarize
+
+
+class ConversationMemory:
+    """Konteks percakapan per sesi: ringkasan bergulir + beberapa giliran terakhir.
+
+    Pesan yang lebih tua dari RECENT_TURNS dilipat ke ringkasan secara bertahap di
+    thread background, jadi waktu tunggu giliran berikutnya tidak bertambah.
+    """
+
+    def __init__(self, recent_turns: int = RECENT_TURNS, token_budget: int = HISTORY_TOKEN_BUDGET,
+                 summarized_upto: int = 0):
+        self.recent_turns = recent_turns
+        self.token_budget = token_budget
+        self.summary = ""
+        self.summarized_upto = summarized_upto
+        self._lock = threading.Lock()
+        self._updating = False
+
+    def context(self, messages: list):
+        """Return (ringkasan, pesan_terbaru) yang muat dalam token_budget."""
+        with self._lock:
+            summary = self.summary
+            start = self.summarized_upto
+        budget = self.token_budget - estimate_tokens(summary)
+        recent = []
+        # Slice dari belakang saja: bagian lama riwayat bisa sudah dipadatkan (lihat ChatHistory).
+        start = max(start, len(messages) - self.recent_turns * 2)
+        for message in reversed(messages[start:]):
+            cost = estimate_tokens(message["content"])
+            if cost > budget:
+                break
+            recent.append({"role": message["role"], "content": message["content"]})
+            budget -= cost
+        recent.reverse()
+        return summary, recent
+
+    def schedule_update(self, messages: list, summarize):
+        """Lipat pesan di luar jendela RECENT_TURNS ke ringkasan (tidak memblokir)."""
+        upto = max(0, len(messages) - self.recent_turns * 2)
+        with self._lock:
+            if upto <= self.summarized_upto or self._updating:
+                return
+            self._updating = True
+            previous, start = self.summary, self.summarized_upto
+        folded = list(messages[start:upto])
+
+        def run():
+            try:
+                summary = summarize(previous, folded)
+            except Exception:
+                summary = extractive_summary(previous, folded)
+            with self._lock:
+                self.summary = summary
+                self.summarized_upto = upto
+                self._updating = False
+
+        threading.Thread(target=run, name="smardos-summary", daemon=True).start()
+
+
+def build_chat_messages(system_prompt: str, summary: str, recent: list, user_content: str) -> list:
+    """Susun pesan untuk /api/chat dengan prefix yang stabil.
+
+    System prompt selalu identik dan berada paling depan, sehingga Ollama dapat memakai
+    ulang KV cache prefix tersebut antar giliran.
+    """
+    messages = [{"role": "system", "content": system_prompt}]
+    if summary:
+        messages.append({"role": "system", "content": f"Ringkasan percakapan sebelumnya:\n{summary}"})
+    messages.extend(recent)
+    messages.append({"role": "user", "content": user_content})
+    return messages
@@ -0,0 +1,250 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import streamlit as st
+
+from services.chat_history import HISTORY_MEMORY_MESSAGES, HISTORY_PAGE_SIZE, ChatHistory
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_DB = os.getenv(
+    "CONVERSATION_DB",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "conversations.db"),
+)
+# Penulisan dikumpulkan selama jendela ini (detik) lalu di-commit dalam satu transaksi.
+CONVERSATION_FLUSH_SECONDS = float(os.getenv("CONVERSATION_FLUSH_SECONDS", "0.2"))
+CONVERSATION_BATCH_SIZE = int(os.getenv("CONVERSATION_BATCH_SIZE", "200"))
+# Batas tunggu flush() saat membuka percakapan; lewat dari ini halaman tetap dibuka.
+CONVERSATION_FLUSH_TIMEOUT = float(os.getenv("CONVERSATION_FLUSH_TIMEOUT", "2"))
+# Jeda maksimum antar percobaan ulang batch yang gagal di-commit.
+CONVERSATION_RETRY_MAX_SECONDS = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    visible_from INTEGER NOT NULL DEFAULT 0,
+    cleared_at REAL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    conversation TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    metrics TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (conversation, seq)
+) WITHOUT ROWID;
+"""
+
+
+class ConversationStore:
+    """Log percakapan append-only di SQLite (mode WAL).
+
+    Semua penulisan lewat antrean ke satu thread writer yang meng-commit per batch,
+    jadi render halaman tidak pernah menunggu fsync. Pembaca memakai koneksi sendiri;
+    di mode WAL pembaca tidak terblokir oleh writer. Pesan diberi nomor urut (seq)
+    per percakapan; "bersihkan riwayat" hanya menggeser visible_from, tanpa
+    menghapus atau menulis ulang baris pesan.
+    """
+
+    def __init__(self, path: str = CONVERSATION_DB, flush_seconds: float = CONVERSATION_FLUSH_SECONDS,
+                 batch_size: int = CONVERSATION_BATCH_SIZE):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.batch_size = max(1, batch_size)
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        writer = self._connect()
+        writer.executescript(SCHEMA)
+        self._reader = self._connect()
+        self._read_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self.commits = 0
+        self._thread = threading.Thread(target=self._run, args=(writer,), name="conversation-writer", daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Di mode WAL, NORMAL tetap konsisten; hanya transaksi terakhir yang bisa hilang saat listrik mati.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ---- penulisan (thread writer) ----
+
+    def append(self, conversation_id: str, seq: int, message: dict):
+        self._queue.put(("append", conversation_id, seq, message, time.time()))
+
+    def clear(self, conversation_id: str, upto_seq: int):
+        """Soft-delete: sembunyikan semua pesan dengan seq < upto_seq."""
+        self._queue.put(("clear", conversation_id, upto_seq, None, time.time()))
+
+    def flush(self, timeout: float = CONVERSATION_FLUSH_TIMEOUT) -> bool:
+        """Tunggu sampai semua penulisan yang sudah diantrekan ter-commit; False jika timeout habis."""
+        with self._queue.all_tasks_done:
+            return self._queue.all_tasks_done.wait_for(lambda: not self._queue.unfinished_tasks, timeout)
+
+    def _run(self, conn: sqlite3.Connection):
+        batch = []
+        retry_delay = self.flush_seconds
+        while True:
+            if not batch:
+                batch.append(self._queue.get())
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._commit(conn, batch)
+            except Exception:
+                # Pesan lama sudah dilepas dari memori (ConversationLog), jadi batch ini satu-satunya
+                # salinannya: jangan dibuang, ulangi dengan jeda yang makin panjang.
+                logger.exception("Gagal menyimpan %d perubahan riwayat chat; dicoba lagi dalam %.1fs",
+                                 len(batch), retry_delay)
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, CONVERSATION_RETRY_MAX_SECONDS)
+                continue
+            retry_delay = self.flush_seconds
+            for _ in batch:
+                self._queue.task_done()
+            batch = []
+
+    def _commit(self, conn: sqlite3.Connection, batch: list):
+        conn.execute("BEGIN")
+        for item in batch:
+            try:
+                self._apply(conn, *item)
+            except sqlite3.Error:
+                raise
+            except Exception:
+                # Data tidak valid (mis. metrics tidak bisa dijadikan JSON) tidak akan pernah berhasil
+                # disimpan; lewati perubahan ini saja agar batch dan thread writer tetap jalan.
+                logger.exception("Perubahan riwayat chat tidak valid dilewati (%s seq %s)", item[1], item[2])
+        conn.execute("COMMIT")
+        self.commits += 1
+
+    @staticmethod
+    def _apply(conn, kind, conversation_id, seq, message, at):
+        conn.execute(
+            "INSERT OR IGNORE INTO conversations (id, created_at) VALUES (?, ?)",
+            (conversation_id, at),
+        )
+        if kind == "append":
+            metrics = message.get("metrics")
+            # OR IGNORE: dua tab dengan percakapan yang sama bisa menulis seq yang sama.
+            conn.execute(
+                "INSERT OR IGNORE INTO messages (conversation, seq, role, content, metrics, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (conversation_id, seq, message["role"], message["content"],
+                 json.dumps(metrics, default=str) if metrics else None, at),
+            )
+        elif kind == "clear":
+            conn.execute(
+                "UPDATE conversations SET visible_from = MAX(visible_from, ?), cleared_at = ? WHERE id = ?",
+                (seq, at, conversation_id),
+            )
+
+    # ---- pembacaan ----
+
+    def bounds(self, conversation_id: str):
+        """Return (visible_from, next_seq) percakapan; (0, 0) jika belum ada."""
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT visible_from FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+            next_seq = self._reader.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE conversation = ?", (conversation_id,)
+            ).fetchone()[0]
+        visible_from = row[0] if row else 0
+        return visible_from, max(next_seq, visible_from)
+
+    def read(self, conversation_id: str, start_seq: int, stop_seq: int) -> list:
+        with self._read_lock:
+            rows = self._reader.execute(
+                "SELECT role, content, metrics FROM messages "
+                "WHERE conversation = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (conversation_id, start_seq, stop_seq),
+            ).fetchall()
+        messages = []
+        for role, content, metrics in rows:
+            message = {"role": role, "content": content}
+            if metrics:
+                message["metrics"] = json.loads(metrics)
+            messages.append(message)
+        return messages
+
+
+class ConversationLog:
+    """Store ChatHistory untuk PersistentChatHistory: pesan lama dibaca ulang dari SQLite."""
+
+    def __init__(self, store: ConversationStore, conversation_id: str, base_seq: int):
+        self.store = store
+        self.conversation_id = conversation_id
+        self.base_seq = base_seq
+
+    def append_block(self, messages: list):
+        # Sudah ditulis satu per satu saat append; cukup dilepas dari memori.
+        pass
+
+    def read(self, start: int, stop: int) -> list:
+        return self.store.read(self.conversation_id, self.base_seq + start, self.base_seq + stop)
+
+
+class PersistentChatHistory(ChatHistory):
+    """ChatHistory yang setiap pesannya ditulis ke ConversationStore.
+
+    Saat dibuka hanya page_size pesan terakhir yang dibaca; pesan yang lebih lama
+    diambil dari SQLite ketika diminta ("muat pesan sebelumnya"). Memori per tab
+    dibatasi memory_limit, berapa pun panjang percakapannya.
+    """
+
+    def __init__(self, store: ConversationStore, conversation_id: str,
+                 memory_limit: int = HISTORY_MEMORY_MESSAGES, page_size: int = HISTORY_PAGE_SIZE):
+        # Pesan milik sesi sebelumnya (mis. sebelum refresh) mungkin belum ter-commit.
+        if not store.flush():
+            logger.warning("Riwayat chat %s dibuka sebelum semua pesan ter-commit", conversation_id)
+        visible_from, next_seq = store.bounds(conversation_id)
+        self.conversation_store = store
+        self.conversation_id = conversation_id
+        super().__init__(memory_limit=memory_limit, page_size=page_size,
+                         store=ConversationLog(store, conversation_id, visible_from))
+        self._recent = store.read(conversation_id, max(visible_from, next_seq - self.page_size), next_seq)
+        self._offset = next_seq - visible_from - len(self._recent)
+
+    @property
+    def base_seq(self) -> int:
+        return self.store.base_seq
+
+    def append(self, message: dict):
+        self.conversation_store.append(self.conversation_id, self.base_seq + len(self), message)
+        super().append(message)
+
+    def clear(self):
+        upto = self.base_seq + len(self)
+        self.conversation_store.clear(self.conversation_id, upto)
+        self.store = ConversationLog(self.conversation_store, self.conversation_id, upto)
+        self._recent = []
+        self._offset = 0
+
+
+@st.cache_resource
+def get_conversation_store():
+    """Satu store (dan satu thread writer) per proses; None jika database tidak bisa dibuka."""
+    try:
+        return ConversationStore()
+    except (sqlite3.Error, OSError):
+        logger.exception("Riwayat chat tidak bisa disimpan ke %s; hanya disimpan di memori", CONVERSATION_DB)
+        return None
@@ -0,0 +1,219 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import streamlit as st
+
+from services.pdf_worker import extract_page_range
+
+DOC_CONTEXT_TOKENS = int(os.getenv("DOC_CONTEXT_TOKENS", "1500"))
+DOC_CHUNK_WORDS = int(os.getenv("DOC_CHUNK_WORDS", "200"))
+DOC_CHUNK_OVERLAP = int(os.getenv("DOC_CHUNK_OVERLAP", "40"))
+DOC_TOP_K = int(os.getenv("DOC_TOP_K", "6"))
+
+# Batas agar berkas raksasa tidak menghabiskan memori/CPU worker.
+DOC_MAX_UPLOAD_MB = float(os.getenv("DOC_MAX_UPLOAD_MB", "50"))
+DOC_MAX_PAGES = int(os.getenv("DOC_MAX_PAGES", "400"))
+DOC_MAX_TEXT_CHARS = int(os.getenv("DOC_MAX_TEXT_CHARS", "2000000"))
+DOC_EXTRACT_WORKERS = int(os.getenv("DOC_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+DOC_PAGES_PER_TASK = int(os.getenv("DOC_PAGES_PER_TASK", "16"))
+
+
+class DocumentTooLarge(ValueError):
+    pass
+
+
+def estimate_tokens(text: str) -> int:
+    """Perkiraan kasar jumlah token (±4 karakter per token) tanpa tokenizer model."""
+    return max(1, len(text) // 4) if text else 0
+
+
+@st.cache_resource
+def get_extraction_pool() -> ProcessPoolExecutor:
+    # spawn: jangan fork proses server Streamlit yang punya banyak thread.
+    return ProcessPoolExecutor(
+        max_workers=DOC_EXTRACT_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def iter_pdf_pages(path: str, page_count: int, pages_per_task: int = DOC_PAGES_PER_TASK):
+    """Yield (nomor_halaman, teks) berurutan sementara rentang halaman diproses paralel.
+
+    Jumlah task yang sedang jalan dibatasi, jadi berhenti lebih awal (generator
+    ditutup) tidak menyisakan ratusan task yang sudah terlanjur dikirim.
+    """
+    if page_count <= pages_per_task or DOC_EXTRACT_WORKERS <= 1:
+        # Tanpa pool: tetap halaman per halaman supaya progres dan batas teks berlaku.
+        from PyPDF2 import PdfReader
+
+        reader = PdfReader(path)
+        for page_number in range(page_count):
+            yield page_number, reader.pages[page_number].extract_text() or ""
+        return
+
+    pool = get_extraction_pool()
+    ranges = deque((start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task))
+    pending = deque()
+    try:
+        while ranges or pending:
+            while ranges and len(pending) < DOC_EXTRACT_WORKERS * 2:
+                start, end = ranges.popleft()
+                pending.append((start, pool.submit(extract_page_range, path, start, end)))
+            start, future = pending.popleft()
+            for offset, text in enumerate(future.result()):
+                yield start + offset, text
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def extract_pdf_text(data: bytes, progress=None):
+    """Return (teks, total_halaman, halaman_terbaca, terpotong)."""
+    from PyPDF2 import PdfReader
+
+    total_pages = len(PdfReader(io.BytesIO(data)).pages)
+    page_count = min(total_pages, DOC_MAX_PAGES)
+    parts = []
+    chars = 0
+    pages_read = 0
+    truncated = page_count < total_pages
+
+    # Worker membaca dari berkas sementara, bukan salinan bytes per task.
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        tmp.write(data)
+        tmp.flush()
+        pages = iter_pdf_pages(tmp.name, page_count)
+        try:
+            for page_number, text in pages:
+                parts.append(text)
+                chars += len(text)
+                pages_read = page_number + 1
+                if progress is not None:
+                    progress(pages_read, page_count)
+                if chars >= DOC_MAX_TEXT_CHARS:
+                    truncated = True
+                    break
+        finally:
+            pages.close()
+
+    return "\n".join(parts)[:DOC_MAX_TEXT_CHARS], total_pages, pages_read, truncated
+
+
+def extract_text(data: bytes, mime_type: str, progress=None):
+    """Ekstraksi teks dari berbagai format dokumen; return (teks, info)."""
+    if len(data) > DOC_MAX_UPLOAD_MB * 1024 * 1024:
+        raise DocumentTooLarge(f"Ukuran berkas melebihi batas {DOC_MAX_UPLOAD_MB:g} MB.")
+    if mime_type == "application/pdf":
+        text, total_pages, pages_read, truncated = extract_pdf_text(data, progress)
+        return text, {"pages": total_pages, "pages_read": pages_read, "truncated": truncated}
+    if mime_type == "text/plain":
+        text = data.decode("utf-8", errors="replace")
+        truncated = len(text) > DOC_MAX_TEXT_CHARS
+        return text[:DOC_MAX_TEXT_CHARS], {"truncated": truncated}
+    return "", {"truncated": False}
+
+
+def chunk_text(text: str, chunk_words: int = DOC_CHUNK_WORDS, overlap: int = DOC_CHUNK_OVERLAP) -> list:
+    """Potong teks per kata dengan tumpang tindih agar kalimat di batas potongan tidak hilang."""
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, chunk_words - overlap)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+class ChunkIndex:
+    """Indeks BM25 kecil di atas potongan dokumen (CountVectorizer + matriks sparse)."""
+
+    def __init__(self, chunks: list, k1: float = 1.5, b: float = 0.75):
+        import numpy as np
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        self.chunks = chunks
+        self.vectorizer = CountVectorizer(lowercase=True, strip_accents="unicode", token_pattern=r"(?u)\b\w+\b")
+        tf = self.vectorizer.fit_transform(chunks).tocsr().astype(np.float32)
+
+        n_chunks = tf.shape[0]
+        doc_len = np.asarray(tf.sum(axis=1)).ravel()
+        avg_len = doc_len.mean() or 1.0
+        df = np.bincount(tf.indices, minlength=tf.shape[1])
+        idf = np.log1p((n_chunks - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        # Bobot BM25 dihitung sekali per (potongan, term); skor query = satu perkalian sparse.
+        rows = np.repeat(np.arange(n_chunks), np.diff(tf.indptr))
+        norm = k1 * (1 - b + b * doc_len[rows] / avg_len)
+        tf.data = idf[tf.indices] * tf.data * (k1 + 1) / (tf.data + norm)
+        self.weights = tf
+
+    def search(self, question: str, top_k: int = DOC_TOP_K) -> list:
+        import numpy as np
+
+        query = self.vectorizer.transform([question])
+        query.data[:] = 1
+        scores = (self.weights @ query.T).toarray().ravel()
+        order = np.argsort(-scores)[:top_k]
+        return [int(i) for i in order if scores[i] > 0]
+
+
+class IngestedDocument:
+
+    def __init__(self, digest: str, name: str, text: str, info: dict = None):
+        self.digest = digest
+        self.name = name
+        self.text = text
+        self.info = info or {}
+        self.chunks = chunk_text(text)
+        self.index = ChunkIndex(self.chunks) if self.chunks else None
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.chunks
+
+    def context_for(self, question: str, token_budget: int = DOC_CONTEXT_TOKENS) -> str:
+        """Potongan paling relevan untuk pertanyaan, dibatasi token_budget."""
+        if self.is_empty:
+            return ""
+        if estimate_tokens(self.text) <= token_budget:
+            return self.text
+
+        picked = []
+        used = 0
+        for position in self.index.search(question, top_k=max(DOC_TOP_K, 1)):
+            cost = estimate_tokens(self.chunks[position])
+            if used + cost > token_budget:
+                continue
+            picked.append(position)
+            used += cost
+        if not picked:
+            # Tidak ada kata yang cocok: beri pembuka dokumen sebagai gambaran umum.
+            picked = [0]
+
+        # Urutan asli dokumen lebih mudah diikuti model daripada urutan skor.
+        return "\n...\n".join(self.chunks[position] for position in sorted(picked))
+
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def _ingest(digest: str, mime_type: str, _name: str, _data: bytes, _progress=None) -> IngestedDocument:
+    # Argumen berawalan _ tidak ikut di-hash Streamlit; kunci cache cukup digest isi berkas.
+    text, info = extract_text(_data, mime_type, _progress)
+    return IngestedDocument(digest, _name, text, info)
+
+
+def ingest_uploaded_file(uploaded_file, progress=None) -> IngestedDocument:
+    """Ekstrak + indeks sekali per isi berkas; pertanyaan berikutnya memakai hasil cache.
+
+    progress(halaman_selesai, total_halaman) dipanggil selama ekstraksi PDF.
+    """
+    data = uploaded_file.getvalue()
+    digest = hashlib.sha256(data).hexdigest()
+    return _ingest(digest, uploaded_file.type, uploaded_file.name, data, progress)
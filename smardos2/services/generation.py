@@ -0,0 +1,141 @@
+"""Jalur generasi jawaban SMARDOS, terpisah dari UI agar bisa dipakai benchmark."""
+import importlib.util
+
+from services.conversation import build_chat_messages
+from services.ollama_client import get_chat_model, get_warmup_tracker
+from services.ollama_pool import NoHealthyHost, get_ollama_pool
+from services.scheduler import PRIORITY_BACKGROUND, get_scheduler
+from services.semantic_cache import SEMANTIC_CACHE_ENABLED, get_semantic_cache
+
+SYSTEM_INSTRUCTIONS = (
+    "Kamu adalah SMARDOS (Smart Asisten Dosen), asisten akademik khusus perguruan tinggi.\n"
+    "TUGAS UTAMA:\n"
+    "1. Hanya jawab pertanyaan yang berkaitan dengan materi perkuliahan, teori akademik, atau metode penelitian.\n"
+    "2. Jika pertanyaan TIDAK berkaitan dengan perkuliahan/pendidikan, tolak dengan sopan.\n"
+    "3. Setiap jawaban WAJIB menyertakan referensi ilmiah di bagian akhir.\n"
+    "4. Format referensi harus mencantumkan Link URL (Google Scholar/DOAJ/portal jurnal).\n"
+    "5. Gunakan Bahasa Indonesia yang formal dan edukatif.\n"
+    "6. Jawaban maksimal 6 paragraf, ringkas dan jelas.\n"
+    "7. Jika memberikan kode/sintaks, WAJIB gunakan blok ```bahasa ... ``` agar rapi."
+)
+
+
+def pool_producer(pool, model_name: str, messages: list, base_url: str = None, num_predict: int = None):
+    """Producer scheduler yang menjalankan /api/chat di host pilihan pool (dengan lease).
+
+    Tanpa base_url, host dipilih saat generasi mendapat slot. Jika host gagal sebelum
+    token pertama, generasi diulang di host sehat berikutnya.
+    """
+    options = {} if num_predict is None else {"num_predict": num_predict}
+
+    def produce(generation_stats: dict):
+        tried = []
+        if base_url is None:
+            pool.wait_ready(pool.timeout * 2)
+        while True:
+            host = base_url or pool.pick(model_name, exclude=tried)
+            if host is None:
+                raise NoHealthyHost(f"tidak ada host Ollama sehat yang memiliki model {model_name}")
+            emitted = False
+            with pool.lease(host):
+                try:
+                    for chunk in get_chat_model(model_name, host, **options).stream(messages):
+                        usage = getattr(chunk, "usage_metadata", None)
+                        if usage:
+                            generation_stats["prompt_tokens"] = usage.get("input_tokens")
+                            generation_stats["output_tokens"] = usage.get("output_tokens")
+                        if chunk.content:
+                            emitted = True
+                            yield chunk.content
+                except Exception as e:
+                    # Setelah token pertama, mengulang di host lain akan menggandakan teks.
+                    if emitted or base_url:
+                        raise
+                    pool.mark_failed(host, e)
+                    tried.append(host)
+                    continue
+            generation_stats["host"] = host
+            # Jawaban selesai berarti bobot model pasti sudah ada di memori Ollama.
+            pool.mark_loaded(host, model_name)
+            get_warmup_tracker().mark_warm(model_name, host)
+            return
+
+    return produce
+
+
+def stream_smardos_response(
+    user_input: str,
+    model_name: str,
+    base_url: str = None,
+    summary: str = "",
+    history: list = (),
+    stats: dict = None,
+    on_queue=None,
+    use_cache: bool = SEMANTIC_CACHE_ENABLED,
+):
+    """Yield potongan jawaban dari Ollama (/api/chat) segera setelah token dihasilkan.
+
+    Request melewati scheduler bersama: dibatasi per model, antre FIFO, dan prompt
+    identik yang sedang diproses ikut memakai generasi yang sama. on_queue(posisi)
+    dipanggil selama request masih antre. Jika stats diberikan, token prompt,
+    waktu antre, host, dan waktu generasi dicatat di sana.
+
+    Tanpa base_url, host dipilih dari pool saat generasi mendapat slot. Jika host
+    gagal sebelum token pertama, generasi diulang di host sehat berikutnya.
+
+    Pertanyaan pembuka (tanpa ringkasan/riwayat) dan tanpa isi dokumen dicek dulu di
+    cache semantik; jawaban untuk pertanyaan yang maknanya sama dipakai ulang.
+    """
+    if importlib.util.find_spec("langchain_ollama") is None:
+        yield "Ollama (langchain_ollama) tidak tersedia di environment ini."
+        return
+
+    probe = None
+    # Pertanyaan lanjutan ("jelaskan lebih detail") bergantung pada riwayat, jadi tidak di-cache.
+    if use_cache and not summary and not history:
+        probe = get_semantic_cache().probe(model_name, user_input)
+        if probe is not None and probe.answer is not None:
+            if stats is not None:
+                stats["cache_similarity"] = probe.similarity
+            yield probe.answer
+            return
+
+    messages = build_chat_messages(SYSTEM_INSTRUCTIONS, summary, list(history), user_input)
+    produce = pool_producer(get_ollama_pool(), model_name, messages, base_url)
+
+    generation = get_scheduler().submit(model_name, messages, produce)
+    try:
+        yield from generation.follow(on_queue)
+        # Hanya pemilik generasi yang menyimpan, dan hanya jawaban yang selesai tanpa error.
+        if probe is not None and generation.producer is produce:
+            get_semantic_cache().put(probe, "".join(generation.chunks))
+    finally:
+        if stats is not None:
+            stats.update(generation.stats)
+            stats["queue_wait"] = generation.queue_wait
+            stats["generation_time"] = generation.generation_time
+            # True jika sesi ini menumpang generasi milik sesi lain
+            stats["coalesced"] = generation.producer is not produce
+
+
+def generate_smardos_response(user_input: str, model_name: str, base_url: str = None) -> str:
+    """Versi non-streaming: tunggu sampai seluruh jawaban selesai."""
+    return "".join(stream_smardos_response(user_input, model_name, base_url))
+
+
+def background_completion(model_name: str, num_predict: int = None):
+    """Return complete(messages) -> str untuk generasi latar seperti ringkasan percakapan.
+
+    Generasi masuk scheduler yang sama dengan prioritas PRIORITY_BACKGROUND, jadi tidak
+    menyalip pertanyaan user dan ikut dihitung di batas per model serta beban host pool.
+    Scheduler dan pool diambil sekarang (di thread script), bukan di thread latar.
+    """
+    scheduler = get_scheduler()
+    pool = get_ollama_pool()
+
+    def complete(messages: list) -> str:
+        producer = pool_producer(pool, model_name, messages, num_predict=num_predict)
+        generation = scheduler.submit(model_name, messages, producer, priority=PRIORITY_BACKGROUND)
+        return "".join(generation.follow())
+
+    return complete
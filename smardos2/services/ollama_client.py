@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+# Berapa lama Ollama menahan bobot model di memori setelah request terakhir.
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "16"))
+
+COLD = "cold"
+WARMING = "warming"
+WARM = "warm"
+FAILED = "failed"
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Satu pool koneksi keep-alive ke Ollama untuk seluruh proses Streamlit."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=OLLAMA_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource(show_spinner=False)
+def get_chat_model(model_name: str, base_url: str, num_predict: int = 350):
+    """Client ChatOllama (/api/chat) per (model, base_url), dibuat sekali lalu dipakai ulang semua sesi."""
+    from langchain_ollama import ChatOllama
+
+    return ChatOllama(
+        model=model_name,
+        temperature=0.3,
+        base_url=base_url,
+        num_predict=num_predict,  # biar lebih cepat & nggak kepanjangan
+        keep_alive=OLLAMA_KEEP_ALIVE,
+    )
+
+
+class WarmupTracker:
+    """Status warm/cold model per (model, base_url) yang dibagi antar sesi."""
+
+    def __init__(self, ps_interval: float = 30.0):
+        self._states = {}
+        self._lock = threading.Lock()
+        self._ps_interval = ps_interval
+        self._ps_checked = {}
+
+    def state(self, model_name: str, base_url: str) -> dict:
+        with self._lock:
+            return dict(self._states.get((model_name, base_url), {"status": COLD}))
+
+    def _set(self, key, **state):
+        with self._lock:
+            self._states[key] = state
+
+    def mark_warm(self, model_name: str, base_url: str):
+        self._set((model_name, base_url), status=WARM, at=time.time())
+
+    def ensure_warm(self, model_name: str, base_url: str):
+        """Muat bobot model di background; tidak memblokir render halaman."""
+        key = (model_name, base_url)
+        with self._lock:
+            status = self._states.get(key, {}).get("status", COLD)
+            if status in (WARMING, WARM):
+                return
+            self._states[key] = {"status": WARMING, "at": time.time()}
+        threading.Thread(target=self._warm_up, args=key, name=f"warmup-{model_name}", daemon=True).start()
+
+    def _warm_up(self, model_name: str, base_url: str):
+        started = time.perf_counter()
+        try:
+            # Prompt kosong hanya memuat model tanpa menghasilkan token.
+            r = get_http_session().post(
+                f"{base_url}/api/generate",
+                json={"model": model_name, "prompt": "", "keep_alive": OLLAMA_KEEP_ALIVE},
+                timeout=300,
+            )
+            r.raise_for_status()
+        except Exception as e:
+            self._set((model_name, base_url), status=FAILED, at=time.time(), error=str(e))
+            return
+        self._set(
+            (model_name, base_url),
+            status=WARM,
+            at=time.time(),
+            load_seconds=time.perf_counter() - started,
+        )
+
+    def refresh_from_server(self, model_name: str, base_url: str):
+        """Sinkronkan dengan /api/ps: model bisa sudah dikeluarkan Ollama setelah keep_alive habis."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._ps_checked.get(base_url, 0) < self._ps_interval:
+                return
+            self._ps_checked[base_url] = now
+        try:
+            r = get_http_session().get(f"{base_url}/api/ps", timeout=2)
+            r.raise_for_status()
+            loaded = {m.get("name") for m in r.json().get("models", [])}
+        except Exception:
+            return
+        key = (model_name, base_url)
+        with self._lock:
+            status = self._states.get(key, {}).get("status", COLD)
+            if model_name in loaded and status != WARM:
+                self._states[key] = {"status": WARM, "at": time.time()}
+            elif model_name not in loaded and status == WARM:
+                self._states[key] = {"status": COLD}
+
+
+@st.cache_resource
+def get_warmup_tracker() -> WarmupTracker:
+    return WarmupTracker()
@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import streamlit as st
+
+from services.ollama_client import get_http_session
+from services.scheduler import OLLAMA_MAX_CONCURRENCY
+
+DEFAULT_OLLAMA_URL = "http://host.docker.internal:11434"
+# Daftar host dipisah koma; jika kosong, hanya OLLAMA_BASE_URL yang dipakai.
+OLLAMA_HOSTS = [
+    url.strip().rstrip("/")
+    for url in (os.getenv("OLLAMA_HOSTS") or os.getenv("OLLAMA_BASE_URL", DEFAULT_OLLAMA_URL)).split(",")
+    if url.strip()
+]
+OLLAMA_POLL_INTERVAL = float(os.getenv("OLLAMA_POLL_INTERVAL", "10"))
+OLLAMA_POLL_TIMEOUT = float(os.getenv("OLLAMA_POLL_TIMEOUT", "2"))
+# Keluarga model embedding di /api/tags (nomic-embed-text, mxbai-embed-large, all-minilm, bge-m3).
+EMBEDDING_FAMILIES = {"bert", "nomic-bert", "xlm-roberta"}
+
+
+def model_key(model_name: str) -> str:
+    """Nama tanpa tag berarti tag ":latest", sama seperti cara Ollama menafsirkannya."""
+    if ":" in model_name.rsplit("/", 1)[-1]:
+        return model_name
+    return f"{model_name}:latest"
+
+
+def has_model(names, model_name: str) -> bool:
+    key = model_key(model_name)
+    return any(model_key(name) == key for name in names)
+
+
+def is_embedding_model(tag: dict) -> bool:
+    """Model /api/tags yang hanya bisa membuat embedding, bukan menjawab chat."""
+    details = tag.get("details") or {}
+    families = set(details.get("families") or ()) | {details.get("family")}
+    return "embed" in tag.get("name", "") or bool(families & EMBEDDING_FAMILIES)
+
+
+class NoHealthyHost(ConnectionError):
+    pass
+
+
+class HostState:
+    def __init__(self, url: str):
+        self.url = url
+        self.healthy = False
+        self.models = set()
+        self.embedding_models = set()
+        self.loaded = set()
+        self.in_flight = 0
+        self.latency = None
+        self.checked_at = None
+        self.error = None
+
+    def as_dict(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "models": sorted(self.models),
+            "embedding_models": sorted(self.embedding_models),
+            "loaded": sorted(self.loaded),
+            "in_flight": self.in_flight,
+            "latency": self.latency,
+            "checked_at": self.checked_at,
+            "error": self.error,
+        }
+
+
+class OllamaPool:
+    """Beberapa host Ollama di belakang satu antarmuka.
+
+    Thread poller membaca /api/tags (model terpasang) dan /api/ps (model di memori)
+    setiap poll_interval detik, jadi halaman cukup membaca inventaris yang sudah
+    ada tanpa menunggu jaringan. pick() memilih host sehat yang punya modelnya:
+    host yang belum penuh didahulukan, lalu yang modelnya sudah di memori, lalu
+    yang paling sedikit generasi berjalan.
+    """
+
+    def __init__(self, urls, poll_interval: float = OLLAMA_POLL_INTERVAL,
+                 timeout: float = OLLAMA_POLL_TIMEOUT, max_per_host: int = OLLAMA_MAX_CONCURRENCY,
+                 session=None):
+        self.hosts = [HostState(url) for url in dict.fromkeys(urls)]
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_per_host = max(1, max_per_host)
+        self.session = session if session is not None else get_http_session()
+        self.rounds = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def urls(self) -> list:
+        return [host.url for host in self.hosts]
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ollama-pool-poller", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=len(self.hosts), thread_name_prefix="ollama-poll") as executor:
+            while True:
+                # Host dicek paralel agar host yang mati (timeout) tidak menunda inventaris host lain.
+                list(executor.map(self.poll_host, self.hosts))
+                with self._lock:
+                    self.rounds += 1
+                self._ready.set()
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def poll_host(self, host: HostState):
+        started = time.perf_counter()
+        try:
+            r = self.session.get(f"{host.url}/api/tags", timeout=self.timeout)
+            r.raise_for_status()
+            tags = r.json().get("models", [])
+            models = {m["name"] for m in tags}
+            embedding_models = {m["name"] for m in tags if is_embedding_model(m)}
+            r = self.session.get(f"{host.url}/api/ps", timeout=self.timeout)
+            loaded = {m.get("name") for m in r.json().get("models", [])} if r.ok else set()
+        except Exception as e:
+            with self._lock:
+                host.healthy = False
+                host.error = str(e)
+                host.checked_at = time.time()
+            return
+        with self._lock:
+            host.healthy = True
+            host.models = models
+            host.embedding_models = embedding_models
+            host.loaded = loaded
+            host.latency = time.perf_counter() - started
+            host.error = None
+            host.checked_at = time.time()
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        """Tunggu putaran poll pertama; untuk pemanggil yang datang sebelum inventaris ada."""
+        return self._ready.wait(timeout)
+
+    def refresh(self):
+        """Minta poller memulai putaran berikutnya sekarang (tidak menunggu hasilnya)."""
+        self._wake.set()
+
+    def models(self) -> list:
+        """Model chat yang tersedia di minimal satu host sehat, dari inventaris terakhir.
+
+        Model embedding (untuk cache semantik) tidak ikut, karena tidak bisa menjawab chat.
+        """
+        with self._lock:
+            return sorted({
+                model for host in self.hosts if host.healthy
+                for model in host.models - host.embedding_models
+            })
+
+    def capacity(self, model_name: str) -> int:
+        """Jumlah host sehat yang punya model ini (minimal 1, untuk batas scheduler)."""
+        with self._lock:
+            return max(1, sum(1 for host in self.hosts if host.healthy and has_model(host.models, model_name)))
+
+    def pick(self, model_name: str, exclude=()):
+        """URL host terbaik untuk model ini, atau None jika tidak ada host sehat yang memilikinya.
+
+        Nama tanpa tag ("nomic-embed-text") cocok dengan "nomic-embed-text:latest" di /api/tags.
+        """
+        with self._lock:
+            candidates = [
+                host for host in self.hosts
+                if host.healthy and has_model(host.models, model_name) and host.url not in exclude
+            ]
+            if not candidates:
+                return None
+            best = min(candidates, key=lambda host: (
+                host.in_flight >= self.max_per_host,
+                not has_model(host.loaded, model_name),
+                host.in_flight,
+                host.latency or 0.0,
+            ))
+            return best.url
+
+    def _host(self, url: str):
+        for host in self.hosts:
+            if host.url == url:
+                return host
+        return None
+
+    @contextmanager
+    def lease(self, url: str):
+        """Hitung generasi yang sedang berjalan di host url selama blok berlangsung."""
+        host = self._host(url)
+        if host is not None:
+            with self._lock:
+                host.in_flight += 1
+        try:
+            yield url
+        finally:
+            if host is not None:
+                with self._lock:
+                    host.in_flight -= 1
+
+    def mark_failed(self, url: str, error):
+        """Keluarkan host dari rotasi sampai poller berikutnya berhasil menghubunginya."""
+        host = self._host(url)
+        if host is None:
+            return
+        with self._lock:
+            host.healthy = False
+            host.error = str(error)
+        self.refresh()
+
+    def mark_loaded(self, url: str, model_name: str):
+        host = self._host(url)
+        if host is not None:
+            with self._lock:
+                host.loaded.add(model_name)
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [host.as_dict() for host in self.hosts]
+
+
+@st.cache_resource
+def get_ollama_pool() -> OllamaPool:
+    """Satu pool (dan satu thread poller) untuk seluruh proses Streamlit."""
+    return OllamaPool(OLLAMA_HOSTS).start()
@@ -0,0 +1,13 @@
+"""Fungsi yang dijalankan di proses worker ekstraksi PDF.
+
+Sengaja dipisah dari services.documents agar proses hasil spawn hanya perlu
+meng-import PyPDF2, bukan Streamlit/numpy.
+"""
+
+
+def extract_page_range(path: str, start: int, end: int) -> list:
+    """Ekstrak teks halaman [start, end) dari berkas PDF."""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import streamlit as st
+
+# Jumlah generasi bersamaan per model; Ollama tanpa GPU mulai thrashing di atas 1-2.
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "1"))
+QUEUE_POLL_SECONDS = 0.5
+
+# Pertanyaan user selalu didahulukan; pekerjaan latar (ringkasan) menunggu di belakangnya.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+
+def prompt_key(model_name: str, messages: list) -> str:
+    payload = json.dumps([model_name, messages], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Generation:
+    """Satu generasi Ollama yang bisa diikuti beberapa sesi sekaligus.
+
+    Token ditulis ke buffer bersama oleh thread produsen; setiap pengikut membaca
+    dari posisinya sendiri, jadi pengikut yang datang belakangan tetap menerima
+    jawaban lengkap dari awal.
+    """
+
+    def __init__(self, scheduler, model_name: str, key: str, producer, priority: int = PRIORITY_INTERACTIVE):
+        self.scheduler = scheduler
+        self.model_name = model_name
+        self.key = key
+        self.producer = producer
+        self.priority = priority
+        self.chunks = []
+        self.stats = {}
+        self.error = None
+        self.done = False
+        self.cancelled = False
+        self.subscribers = 0
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self._cond = threading.Condition()
+
+    @property
+    def queue_wait(self):
+        if self.started_at is None:
+            return time.monotonic() - self.enqueued_at
+        return self.started_at - self.enqueued_at
+
+    @property
+    def generation_time(self):
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def _mark_started(self):
+        with self._cond:
+            self.started_at = time.monotonic()
+            self._cond.notify_all()
+
+    def run(self):
+        """Dijalankan di thread worker scheduler setelah mendapat slot."""
+        self._mark_started()
+        stream = self.producer(self.stats)
+        try:
+            for chunk in stream:
+                with self._cond:
+                    if self.cancelled:
+                        break
+                    self.chunks.append(chunk)
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            # Menutup generator ikut memutus stream HTTP ke Ollama saat dibatalkan.
+            stream.close()
+            with self._cond:
+                self.finished_at = time.monotonic()
+                self.done = True
+                self._cond.notify_all()
+            self.scheduler._finished(self)
+
+    def follow(self, on_queue=None):
+        """Yield token untuk satu pengikut; on_queue(posisi) dipanggil selama masih antre."""
+        position = 0
+        try:
+            while True:
+                if self.started_at is None and on_queue is not None:
+                    on_queue(self.scheduler.position(self))
+                with self._cond:
+                    if position >= len(self.chunks) and not self.done:
+                        self._cond.wait(QUEUE_POLL_SECONDS)
+                    new_chunks = self.chunks[position:]
+                    position += len(new_chunks)
+                    finished = self.done and position >= len(self.chunks)
+                yield from new_chunks
+                if finished:
+                    break
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.scheduler._unsubscribe(self)
+
+
+class OllamaScheduler:
+    """Antrean FIFO per model dengan batas konkurensi dan penggabungan prompt identik.
+
+    Batas per model adalah max_concurrency dikali capacity(model), yaitu jumlah host
+    Ollama yang sanggup menjalankan model tersebut. Di dalam antrean, generasi
+    diurutkan menurut prioritas lalu waktu masuk, jadi pekerjaan latar tidak pernah
+    mendahului (atau menambah posisi antrean) pertanyaan user.
+    """
+
+    def __init__(self, max_concurrency: int = OLLAMA_MAX_CONCURRENCY, history_size: int = 200,
+                 capacity=lambda model_name: 1):
+        self.max_concurrency = max(1, max_concurrency)
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._running = {}
+        self._in_flight = {}
+        self.submitted = 0
+        self.coalesced = 0
+        # (waktu antre, waktu generasi) untuk generasi yang baru selesai
+        self.recent = deque(maxlen=history_size)
+
+    def submit(self, model_name: str, messages: list, producer, priority: int = PRIORITY_INTERACTIVE) -> Generation:
+        """Daftarkan generasi; prompt identik yang sedang berjalan/antre akan diikuti bersama."""
+        key = prompt_key(model_name, messages)
+        with self._lock:
+            self.submitted += 1
+            generation = self._in_flight.get(key)
+            if generation is not None and not generation.cancelled:
+                self.coalesced += 1
+                generation.subscribers += 1
+                return generation
+
+            generation = Generation(self, model_name, key, producer, priority)
+            generation.subscribers = 1
+            self._in_flight[key] = generation
+            queue = self._queues.setdefault(model_name, deque())
+            # Sisipkan sebelum generasi pertama yang prioritasnya lebih rendah (FIFO per prioritas).
+            index = next((i for i, queued in enumerate(queue) if queued.priority > priority), len(queue))
+            queue.insert(index, generation)
+            self._dispatch(model_name)
+            return generation
+
+    def position(self, generation: Generation) -> int:
+        """Posisi dalam antrean (1 = berikutnya); 0 jika sudah berjalan."""
+        with self._lock:
+            queue = self._queues.get(generation.model_name, ())
+            for index, queued in enumerate(queue):
+                if queued is generation:
+                    return index + 1
+            return 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = [w for w, _ in self.recent]
+            gens = [g for _, g in self.recent if g is not None]
+            return {
+                "queued": {model: len(queue) for model, queue in self._queues.items() if queue},
+                "running": {model: count for model, count in self._running.items() if count},
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "avg_queue_wait": sum(waits) / len(waits) if waits else 0.0,
+                "avg_generation_time": sum(gens) / len(gens) if gens else 0.0,
+            }
+
+    def _dispatch(self, model_name: str):
+        # Dipanggil dengan self._lock dipegang.
+        queue = self._queues.get(model_name)
+        limit = self.max_concurrency * self.capacity(model_name)
+        while queue and self._running.get(model_name, 0) < limit:
+            generation = queue.popleft()
+            self._running[model_name] = self._running.get(model_name, 0) + 1
+            threading.Thread(target=generation.run, name=f"ollama-{model_name}", daemon=True).start()
+
+    def _finished(self, generation: Generation):
+        with self._lock:
+            self._running[generation.model_name] -= 1
+            if self._in_flight.get(generation.key) is generation:
+                del self._in_flight[generation.key]
+            # Statistik waktu tunggu ditampilkan ke user, jadi hanya dari pertanyaan user.
+            if not generation.cancelled and generation.priority == PRIORITY_INTERACTIVE:
+                self.recent.append((generation.queue_wait, generation.generation_time))
+            self._dispatch(generation.model_name)
+
+    def _unsubscribe(self, generation: Generation):
+        with self._lock:
+            generation.subscribers -= 1
+            if generation.subscribers > 0 or generation.done:
+                return
+            # Tidak ada lagi yang menunggu: batalkan agar slot tidak terbuang.
+            generation.cancelled = True
+            if self._in_flight.get(generation.key) is generation:
+                del self._in_flight[generation.key]
+            queue = self._queues.get(generation.model_name)
+            if queue and generation in queue:
+                queue.remove(generation)
+
+
+@st.cache_resource
+def get_scheduler() -> OllamaScheduler:
+    """Satu scheduler untuk semua sesi di proses Streamlit ini."""
+    from services.ollama_pool import get_ollama_pool
+
+    return OllamaScheduler(capacity=lambda model_name: get_ollama_pool().capacity(model_name))
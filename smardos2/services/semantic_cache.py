@@ -0,0 +1,235 @@
+import itertools
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1") != "0"
+# Model embedding Ollama; jika tidak ada host yang memilikinya, dipakai vectorizer lokal.
+OLLAMA_EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+# Kemiripan kosinus minimum agar jawaban tersimpan dipakai ulang.
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+# Vectorizer lokal hanya leksikal, jadi ambangnya praktis menuntut kata kunci yang sama. Parafrase
+# dengan kata berbeda ("jelaskan metode kualitatif" vs "apa itu penelitian kualitatif", ~0.5)
+# hanya tertangkap oleh embedding Ollama; tanpa model embedding, cache ini praktis cache kata kunci.
+SEMANTIC_CACHE_LOCAL_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_LOCAL_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "500"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", str(24 * 3600)))
+
+DOCUMENT_MARKER = "<CONTEXT_DOKUMEN>"
+# Kata pembuka pertanyaan yang tidak mengubah topik ("apa itu X" == "jelaskan X"). Kata tanya yang
+# mengubah jenis jawaban (bagaimana, mengapa, kenapa, kapan, siapa) sengaja tidak dibuang:
+# "kenapa terjadi inflasi" dan "bagaimana terjadi inflasi" butuh jawaban berbeda.
+QUESTION_STOP_WORDS = [
+    "apa", "apakah", "itu", "yang", "dan", "atau", "di", "ke", "dari", "pada", "dalam", "adalah",
+    "ialah", "dengan", "untuk", "tentang", "jelaskan", "terangkan", "uraikan", "maksud", "dimaksud",
+    "pengertian", "definisi", "tolong", "mohon", "saya", "kak", "pak", "bu", "dong", "ya", "sih", "nya",
+    "secara", "singkat",
+]
+_question_prefix = re.compile(r"^\s*Pertanyaan User:\s*")
+
+
+def cache_question(user_input: str):
+    """Teks pertanyaan yang dipakai untuk cache, atau None jika prompt membawa isi dokumen."""
+    if DOCUMENT_MARKER in user_input:
+        return None
+    question = _question_prefix.sub("", user_input).strip()
+    return question or None
+
+
+class LocalEmbedder:
+    """Vectorizer kata ber-hash (tanpa state, tanpa jaringan) sebagai cadangan embedding Ollama."""
+
+    name = "local"
+    threshold = SEMANTIC_CACHE_LOCAL_THRESHOLD
+
+    def __init__(self):
+        # sklearn baru diimpor pada embed pertama, bukan saat cache dibuat di render halaman.
+        self.vectorizer = None
+
+    def _build_vectorizer(self):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        return HashingVectorizer(
+            n_features=2 ** 18,
+            lowercase=True,
+            strip_accents="unicode",
+            token_pattern=r"(?u)\b\w+\b",
+            stop_words=QUESTION_STOP_WORDS,
+            alternate_sign=False,
+            norm="l2",
+        )
+
+    def embed(self, text: str):
+        if self.vectorizer is None:
+            self.vectorizer = self._build_vectorizer()
+        row = self.vectorizer.transform([text])
+        if not row.nnz:
+            return None
+        # Hanya simpan koordinat non-nol: vektor cache tetap kecil meski dimensinya 2^18.
+        return dict(zip(row.indices.tolist(), row.data.tolist()))
+
+
+class OllamaEmbedder:
+    """Embedding lewat /api/embed di host pool yang memiliki model embedding."""
+
+    threshold = SEMANTIC_CACHE_THRESHOLD
+
+    def __init__(self, pool, model: str = OLLAMA_EMBED_MODEL, timeout: float = 2.0):
+        self.pool = pool
+        self.model = model
+        self.timeout = timeout
+        self.name = f"ollama:{model}"
+
+    def available(self) -> bool:
+        return self.pool.pick(self.model) is not None
+
+    def embed(self, text: str):
+        import numpy as np
+
+        host = self.pool.pick(self.model)
+        if host is None:
+            return None
+        r = self.pool.session.post(
+            f"{host}/api/embed", json={"model": self.model, "input": text}, timeout=self.timeout
+        )
+        r.raise_for_status()
+        vector = np.asarray(r.json()["embeddings"][0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+
+def _similarity(a, b) -> float:
+    if isinstance(a, dict):
+        if len(b) < len(a):
+            a, b = b, a
+        return float(sum(value * b.get(index, 0.0) for index, value in a.items()))
+    return float(a @ b)
+
+
+class CacheProbe:
+    """Hasil lookup satu pertanyaan; dipakai lagi untuk put() agar tidak embed dua kali."""
+
+    def __init__(self, partition, vector, question: str, threshold: float, answer=None, similarity=0.0):
+        self.partition = partition
+        self.vector = vector
+        self.question = question
+        self.threshold = threshold
+        self.answer = answer
+        self.similarity = similarity
+
+
+class SemanticCache:
+    """Cache jawaban LLM berdasarkan kemiripan makna pertanyaan.
+
+    Indeks vektor in-memory dipartisi per (model chat, embedder), karena jawaban
+    model berbeda tidak boleh tertukar dan vektor dari embedder berbeda tidak bisa
+    dibandingkan. Setiap partisi dibatasi max_entries (LRU) dan ttl detik.
+    """
+
+    def __init__(self, embedders, max_entries: int = SEMANTIC_CACHE_SIZE, ttl: float = SEMANTIC_CACHE_TTL,
+                 clock=time.monotonic):
+        self.embedders = list(embedders)
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.clock = clock
+        self._partitions = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+        self.embed_errors = 0
+
+    def _embed(self, question: str):
+        for embedder in self.embedders:
+            if hasattr(embedder, "available") and not embedder.available():
+                continue
+            try:
+                vector = embedder.embed(question)
+            except Exception:
+                # Host embedding bermasalah: turun ke embedder berikutnya (vectorizer lokal).
+                with self._lock:
+                    self.embed_errors += 1
+                continue
+            if vector is not None:
+                return embedder, vector
+        return None, None
+
+    def probe(self, model_name: str, user_input: str):
+        """Cari jawaban untuk pertanyaan ini; None jika prompt tidak boleh di-cache."""
+        question = cache_question(user_input)
+        if question is None:
+            with self._lock:
+                self.skipped += 1
+            return None
+        embedder, vector = self._embed(question)
+        if embedder is None:
+            with self._lock:
+                self.skipped += 1
+            return None
+
+        probe = CacheProbe((model_name, embedder.name), vector, question, embedder.threshold)
+        now = self.clock()
+        with self._lock:
+            entries = self._partitions.get(probe.partition)
+            best_id, best = None, 0.0
+            if entries:
+                for entry_id, entry in list(entries.items()):
+                    if entry["expires"] <= now:
+                        del entries[entry_id]
+                        self.evictions += 1
+                        continue
+                    similarity = _similarity(vector, entry["vector"])
+                    if similarity > best:
+                        best_id, best = entry_id, similarity
+            if best_id is not None and best >= probe.threshold:
+                entries.move_to_end(best_id)
+                probe.answer = entries[best_id]["answer"]
+                probe.similarity = best
+                self.hits += 1
+            else:
+                self.misses += 1
+        return probe
+
+    def put(self, probe: CacheProbe, answer: str):
+        if not answer:
+            return
+        with self._lock:
+            entries = self._partitions.setdefault(probe.partition, OrderedDict())
+            entries[next(self._ids)] = {
+                "vector": probe.vector,
+                "question": probe.question,
+                "answer": answer,
+                "expires": self.clock() + self.ttl,
+            }
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "skipped": self.skipped,
+                "evictions": self.evictions,
+                "embed_errors": self.embed_errors,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": {
+                    f"{model}/{embedder}": len(entries)
+                    for (model, embedder), entries in self._partitions.items()
+                },
+            }
+
+
+@st.cache_resource
+def get_semantic_cache() -> SemanticCache:
+    from services.ollama_pool import get_ollama_pool
+
+    return SemanticCache([OllamaEmbedder(get_ollama_pool()), LocalEmbedder()])